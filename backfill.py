@@ -0,0 +1,167 @@
+import codecs
+import json
+import logging
+
+import homework
+from constants import BACKFILL_CHUNK_SIZE, BACKFILL_MAX_ITEM_SIZE
+from schema import VALIDATOR, Homework
+
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = ' \t\n\r'
+
+
+class HomeworkStream:
+    """Iterates over the homeworks of an API response read in chunks.
+
+    Only the homework being decoded and the unread part of the current
+    chunk are kept in memory, whatever the length of the history is.
+    The other members of the response, like `current_date`, are put
+    into `members` as soon as they are read.
+
+    Arguments:
+        chunks (iterable): Bytes of the response body.
+        max_item_size (int): Maximum characters of a single value.
+
+    Raises:
+        ValueError: Exception for a malformed or truncated response.
+    """
+
+    def __init__(self, chunks, max_item_size=BACKFILL_MAX_ITEM_SIZE):
+        self.members = {}
+        self.max_item_size = max_item_size
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._exhausted = False
+
+    def __iter__(self):
+        """Yields the homeworks one by one."""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            name = self._value()
+            self._expect(':')
+            if name == 'homeworks' and self._peek() == '[':
+                yield from self._array()
+            else:
+                self.members[name] = self._value()
+            if self._separator('}'):
+                return
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._separator(']'):
+                return
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(
+                    self._buffer, self._position
+                )
+                if end < len(self._buffer) or self._exhausted:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._exhausted:
+                    raise
+            if len(self._buffer) - self._position > self.max_item_size:
+                raise ValueError('Homework is too large to be decoded.')
+            self._fill()
+
+    def _peek(self):
+        while True:
+            while (
+                self._position < len(self._buffer)
+                and self._buffer[self._position] in WHITESPACE
+            ):
+                self._position += 1
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if self._exhausted:
+                raise ValueError('Unexpected end of the response.')
+            self._fill()
+
+    def _next_char(self):
+        char = self._peek()
+        self._position += 1
+        return char
+
+    def _expect(self, char):
+        if self._next_char() != char:
+            raise ValueError(
+                f'Expected "{char}" at the position {self._position - 1}.'
+            )
+
+    def _separator(self, closing):
+        char = self._next_char()
+        if char not in (',', closing):
+            raise ValueError(
+                f'Expected "," or "{closing}" at the position '
+                f'{self._position - 1}.'
+            )
+        return char == closing
+
+    def _fill(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            text = self._decoder.decode(b'', final=True)
+            self._exhausted = True
+        else:
+            text = self._decoder.decode(chunk)
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+
+
+def validated(items):
+    """Yields the `Homework` records of the valid items, logs the others."""
+    for position, item in enumerate(items):
+        record = VALIDATOR.validate_homework(item, f'homeworks[{position}]')
+        if isinstance(record, Homework):
+            yield record
+            continue
+        for error in record:
+            logger.error('Invalid homework skipped: %s', error)
+
+
+def backfill(index, from_date=0, on_change=None):
+    """Rebuilds the homework index of the current tenant from the history.
+
+    Every homework is validated like the polled ones, the invalid ones
+    are logged and skipped.
+
+    Arguments:
+        index (state.HomeworkIndex): Index to be updated.
+        from_date (int): Timestamp the history starts from.
+        on_change (callable): Called with the homework and its rendered
+            message for every status changed in the index.
+
+    Raises:
+        StatusCodeException: Exception if HTTP request code status is not 200.
+        ValueError: Exception for a malformed response.
+
+    Returns:
+        int: The `current_date` of the response to continue polling from.
+    """
+    response = homework.get_api_response(from_date, stream=True)
+    stream = HomeworkStream(response.iter_content(BACKFILL_CHUNK_SIZE))
+    try:
+        for record in index.changes(validated(stream)):
+            message = homework.parse_status(record)
+            index.update(record)
+            if on_change is not None:
+                on_change(record, message)
+    finally:
+        response.close()
+    return stream.members.get('current_date', from_date)
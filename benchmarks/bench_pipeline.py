@@ -0,0 +1,182 @@
+"""Micro-benchmarks of the homework pipeline functions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --save benchmarks/baseline.json
+    python -m benchmarks.bench_pipeline --compare benchmarks/baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+from contextlib import contextmanager
+
+import requests
+import telebot
+
+import tests.check_utils as check_utils
+
+os.environ.setdefault('PRACTICUM_TOKEN', 'sometoken')
+os.environ.setdefault('TELEGRAM_TOKEN', '1234:abcdefg')
+os.environ.setdefault('TELEGRAM_CHAT_ID', '12345')
+
+import homework  # noqa: E402
+from schema import VALIDATOR  # noqa: E402
+
+SIZES = (0, 1, 10, 100, 1000, 10000)
+STATUSES = tuple(homework.HOMEWORK_VERDICTS)
+REPEATS = 5
+REGRESSION_RATIO = 1.25
+
+
+def make_payload(size):
+    """Returns an API response with `size` homeworks."""
+    return {
+        'homeworks': [
+            {
+                'id': number,
+                'homework_name': f'hw{number}.zip',
+                'status': STATUSES[number % len(STATUSES)],
+                'reviewer_comment': 'Принято!',
+                'date_updated': '2021-04-11T10:31:09Z',
+                'lesson_name': 'Проект спринта: Деплой бота',
+            }
+            for number in range(size)
+        ],
+        'current_date': 1000198991,
+    }
+
+
+@contextmanager
+def patched(target, name, value):
+    """Temporarily replaces an attribute."""
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+def mocked_get(payload):
+    """Returns a `requests.get` replacement answering with `payload`."""
+    def get(*args, **kwargs):
+        return check_utils.MockResponseGET(data=payload)
+    return get
+
+
+def break_sleep(secs):
+    """Stops `main()` at the end of its first cycle."""
+    raise check_utils.BreakInfiniteLoop('break')
+
+
+def run_main_cycle():
+    """Runs a single cycle of `main()`."""
+    try:
+        homework.main()
+    except check_utils.BreakInfiniteLoop:
+        pass
+
+
+def measure(func):
+    """Returns the best seconds per call and the peak allocated bytes."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=REPEATS, number=number)) / number
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(sizes=SIZES):
+    """Measures every pipeline function for every payload size.
+
+    Returns:
+        dict: Seconds per call and peak bytes by the benchmark names.
+    """
+    results = {}
+    for size in sizes:
+        payload = make_payload(size)
+        homeworks = payload['homeworks']
+        cases = {
+            'check_response': lambda: homework.check_response(payload),
+            'validate': lambda: VALIDATOR.validate(payload),
+            'parse_status': lambda: [
+                homework.parse_status(item) for item in homeworks
+            ],
+            'get_api_answer': lambda: homework.get_api_answer(0),
+            'main_cycle': run_main_cycle,
+        }
+        with patched(requests, 'get', mocked_get(payload)), \
+                patched(telebot, 'TeleBot', check_utils.MockTelegramBot), \
+                patched(time, 'sleep', break_sleep):
+            for name, func in cases.items():
+                seconds, peak = measure(func)
+                results[f'{name}[{size}]'] = {
+                    'seconds': seconds,
+                    'peak_bytes': peak,
+                }
+    return results
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    """Returns the names of the benchmarks slower than the baseline."""
+    return [
+        name for name, result in results.items()
+        if name in baseline
+        and result['seconds'] > baseline[name]['seconds'] * ratio
+    ]
+
+
+def print_results(results, baseline=None):
+    """Prints the results, with the change against the baseline."""
+    for name, result in results.items():
+        line = (
+            f'{name:<24} {result["seconds"] * 1e6:>14.2f} us'
+            f' {result["peak_bytes"]:>12} B'
+        )
+        if baseline and name in baseline:
+            change = result['seconds'] / baseline[name]['seconds'] - 1
+            line += f' {change:>+8.1%}'
+        print(line)
+
+
+def main(argv=None):
+    """Runs the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--save', help='File to save the results to.')
+    parser.add_argument('--compare', help='Baseline file to compare with.')
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=SIZES,
+        help='Numbers of homeworks in the payloads.'
+    )
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    results = run_benchmarks(args.sizes)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if baseline:
+        regressions = compare(results, baseline)
+        if regressions:
+            print(f'Regressions: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Startup benchmark of the bot and the engine against their budgets.
+
+Measures the import time of the entry point modules, with the slowest
+imports from `python -X importtime`, and the time from the process start
+to the first request reaching a fake Practicum API. Run from the
+repository root:
+
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_servers import FakePracticumServer, FakeTelegramServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEATS = 5
+TOP_IMPORTS = 10
+FIRST_POLL_TIMEOUT = 10
+# Seconds, on top of the bare interpreter startup measured alongside.
+BUDGETS = {
+    'import homework': 0.12,
+    'import engine': 0.25,
+    'homework.py first poll': 0.5,
+    'engine.py first poll': 0.75,
+}
+
+
+def parse_importtime(output):
+    """Returns (self, cumulative, name) of every import, in microseconds."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(own), int(cumulative), name.strip()))
+    return imports
+
+
+def run_python(args, env=None):
+    """Runs the interpreter and returns the wall seconds and the stderr."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *args], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return time.perf_counter() - started, result.stderr
+
+
+def measure_import(module, env):
+    """Returns the best seconds to import a module and its slowest imports.
+
+    The interpreter startup is not included.
+    """
+    best = None
+    for _ in range(REPEATS):
+        seconds, _ = run_python(['-c', f'import {module}'], env)
+        bare, _ = run_python(['-c', 'pass'], env)
+        best = seconds - bare if best is None else min(best, seconds - bare)
+    _, output = run_python(['-X', 'importtime', '-c', f'import {module}'], env)
+    imports = sorted(parse_importtime(output), reverse=True)
+    return max(best, 0), imports[:TOP_IMPORTS]
+
+
+def measure_first_poll(script, env):
+    """Returns the best seconds from starting a script to its first poll.
+
+    Every run is stopped with SIGTERM once the poll is received.
+    """
+    best = None
+    for _ in range(REPEATS):
+        practicum = FakePracticumServer().start()
+        telegram = FakeTelegramServer().start()
+        env = dict(
+            env,
+            PRACTICUM_ENDPOINT=practicum.url + '/api/user_api/',
+            TELEGRAM_API_URL=telegram.api_url,
+        )
+        try:
+            bare, _ = run_python(['-c', 'pass'], env)
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, script], cwd=ROOT, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                while not practicum.stats:
+                    if time.perf_counter() - started > FIRST_POLL_TIMEOUT:
+                        raise RuntimeError(f'{script} has not polled.')
+                    time.sleep(0.001)
+                seconds = time.perf_counter() - started - bare
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(FIRST_POLL_TIMEOUT)
+        finally:
+            practicum.stop()
+            telegram.stop()
+        best = seconds if best is None else min(best, seconds)
+    return max(best, 0)
+
+
+def make_env(directory):
+    """Returns the environment of a single tenant bot in a directory."""
+    env = {
+        name: value for name, value in os.environ.items()
+        if name not in ('TENANTS_FILE', 'SHARD_DB_PATH', 'METRICS_PORT')
+    }
+    env.update(
+        PRACTICUM_TOKEN='sometoken',
+        TELEGRAM_TOKEN='1234:abcdefg',
+        TELEGRAM_CHAT_ID='12345',
+        ENV_FILE=os.path.join(directory, '.env'),
+        STATE_DB_PATH=os.path.join(directory, 'state.db'),
+        LOG_FILE=os.path.join(directory, 'program.log'),
+    )
+    return env
+
+
+def run_benchmarks():
+    """Measures the startup.
+
+    Returns:
+        tuple: Seconds by the benchmark names and the slowest imports by
+            the module names.
+    """
+    results = {}
+    slowest = {}
+    with tempfile.TemporaryDirectory() as directory:
+        env = make_env(directory)
+        for module in ('homework', 'engine'):
+            results[f'import {module}'], slowest[module] = measure_import(
+                module, env
+            )
+        for script in ('homework.py', 'engine.py'):
+            results[f'{script} first poll'] = measure_first_poll(script, env)
+    return results, slowest
+
+
+def main(argv=None):
+    """Runs the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--imports', action='store_true',
+        help='Print the slowest imports of every module.'
+    )
+    args = parser.parse_args(argv)
+    results, slowest = run_benchmarks()
+    if args.imports:
+        for module, imports in slowest.items():
+            print(f'{module}:')
+            for own, cumulative, name in imports:
+                print(
+                    f'  {name:<40} {own / 1e3:>8.2f} ms'
+                    f' {cumulative / 1e3:>8.2f} ms'
+                )
+    over = []
+    for name, seconds in results.items():
+        budget = BUDGETS[name]
+        print(
+            f'{name:<24} {seconds * 1e3:>8.1f} ms'
+            f'  budget {budget * 1e3:>6.0f} ms'
+        )
+        if seconds > budget:
+            over.append(name)
+    if over:
+        print(f'Over the budget: {", ".join(over)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Throughput of the Telegram delivery against the fake Bot API.
+
+Sends the same messages like the delivery queue does: at most `workers`
+at a time, from the threads of an executor. Once over telebot's own
+per-thread sessions and once over the shared pool installed by
+`homework.configure_telegram`. Run from the repository root:
+
+    python -m benchmarks.bench_telegram --messages 2000 --handshake 0.05
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import TeleBot, apihelper, types
+
+import homework
+from benchmarks.fake_servers import FakeTelegramServer, FaultProfile
+from constants import DELIVERY_WORKERS
+from tenants import Tenant, current_tenant
+
+MODES = ('per-thread sessions', 'shared pool')
+
+
+def send(bot, number, chats, slots):
+    """Sends a message to one of the chats and frees its slot."""
+    try:
+        current_tenant.set(Tenant('token', str(number % chats)))
+        homework.send_message(bot, f'Message {number}')
+    finally:
+        slots.release()
+
+
+def run_mode(mode, messages, workers, threads, chats, faults):
+    """Sends the messages in a mode and returns its statistics."""
+    server = FakeTelegramServer(faults=faults).start()
+    original = apihelper.API_URL, apihelper.CUSTOM_REQUEST_SENDER
+    apihelper.API_URL = server.api_url
+    apihelper.CUSTOM_REQUEST_SENDER = None
+    client = None
+    if mode == 'shared pool':
+        homework.configure_telegram()
+        client = apihelper.CUSTOM_REQUEST_SENDER.__self__
+    bot = TeleBot(token='1234:abcdefg')
+    try:
+        slots = threading.BoundedSemaphore(workers)
+        futures = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for number in range(messages):
+                slots.acquire()
+                futures.append(
+                    executor.submit(send, bot, number, chats, slots)
+                )
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+    finally:
+        apihelper.API_URL, apihelper.CUSTOM_REQUEST_SENDER = original
+        if client is not None:
+            client.close()
+        server.stop()
+    return {
+        'messages_per_second': messages / elapsed,
+        'connections': server.connections,
+        'delivered': sum(server.messages.values()),
+    }
+
+
+def measure_markup():
+    """Returns the seconds to build and serialize the markup per message."""
+    timer = timeit.Timer(
+        lambda: apihelper._convert_markup(types.ReplyKeyboardRemove())
+    )
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main(argv=None):
+    """Runs the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument(
+        '--workers', type=int, default=DELIVERY_WORKERS,
+        help='Messages sent at the same time.'
+    )
+    parser.add_argument(
+        '--threads', type=int, default=32,
+        help='Threads of the executor the messages are sent from.'
+    )
+    parser.add_argument('--chats', type=int, default=100)
+    parser.add_argument(
+        '--handshake', type=float, default=0.05,
+        help='Seconds to open a connection, like a TLS handshake.'
+    )
+    parser.add_argument('--latency', type=float, default=0.005)
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    faults = FaultProfile(latency=args.latency, handshake=args.handshake)
+    results = {
+        mode: run_mode(
+            mode, args.messages, args.workers, args.threads, args.chats,
+            faults,
+        )
+        for mode in MODES
+    }
+    for mode, result in results.items():
+        print(
+            f'{mode:<20} {result["messages_per_second"]:>8.1f} msg/s'
+            f' {result["connections"]:>5} connections'
+            f' {result["delivered"]:>6} delivered'
+        )
+    before, after = (
+        results[mode]['messages_per_second'] for mode in MODES
+    )
+    print(f'{"change":<20} {after / before - 1:>+8.1%}')
+    print(
+        f'{"markup per message":<20} {measure_markup() * 1e6:>8.2f} us'
+        ' saved by the serialized one'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
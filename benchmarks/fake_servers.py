@@ -0,0 +1,353 @@
+"""Local stand-ins for the Practicum API and the Telegram Bot API.
+
+Run both from the repository root and point the bot at them with
+the PRACTICUM_ENDPOINT and TELEGRAM_API_URL environment variables:
+
+    python -m benchmarks.fake_servers --practicum-port 8080
+    export PRACTICUM_ENDPOINT=http://127.0.0.1:8080/api/
+    export TELEGRAM_API_URL='http://127.0.0.1:8081/bot{0}/{1}'
+    python engine.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STATUSES = ('reviewing', 'rejected', 'reviewing', 'approved')
+
+
+@dataclass
+class FaultProfile:
+    """Latency distribution and error rates of a fake server.
+
+    Arguments:
+        latency (float): Median latency in seconds.
+        latency_sigma (float): Sigma of the log-normal latency.
+        error_rate (float): Share of the 5xx responses.
+        throttle_rate (float): Share of the 429 responses.
+        retry_after (int): Seconds sent with the 429 responses.
+        timeout_rate (float): Share of the responses delayed by `hang`.
+        hang (float): Seconds a timed out response is delayed by.
+        malformed_rate (float): Share of the responses with broken JSON.
+        handshake (float): Seconds every new connection is delayed by,
+            like by a TLS handshake.
+    """
+
+    latency: float = 0
+    latency_sigma: float = 0.5
+    error_rate: float = 0
+    throttle_rate: float = 0
+    retry_after: int = 1
+    timeout_rate: float = 0
+    hang: float = 30
+    malformed_rate: float = 0
+    handshake: float = 0
+
+    def pick(self, rng):
+        """Sleeps the latency and returns the fault for a request or None."""
+        if self.latency:
+            time.sleep(
+                rng.lognormvariate(0, self.latency_sigma) * self.latency
+            )
+        roll = rng.random()
+        for fault, rate in (
+            ('timeout', self.timeout_rate),
+            ('error', self.error_rate),
+            ('throttle', self.throttle_rate),
+            ('malformed', self.malformed_rate),
+        ):
+            if roll < rate:
+                if fault == 'timeout':
+                    time.sleep(self.hang)
+                return fault
+            roll -= rate
+        return None
+
+
+def scripted_timeline(token, start, step=60):
+    """Returns the status changes of a token as (timestamp, homework) pairs.
+
+    The homework of a token goes through `STATUSES`, one change every
+    `step` seconds after a token-specific offset.
+    """
+    rng = random.Random(token)
+    offset = rng.uniform(0, step)
+    return [
+        (start + offset + number * step, {
+            'id': rng.randrange(10 ** 9),
+            'homework_name': f'{token}.zip',
+            'status': status,
+            'reviewer_comment': '',
+            'lesson_name': 'Проект спринта',
+        })
+        for number, status in enumerate(STATUSES)
+    ]
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Threaded HTTP server counting the requests by the outcome.
+
+    Arguments:
+        port (int): Port to listen on, 0 picks a free one.
+        faults (FaultProfile): Latency and errors of the responses.
+        seed (int): Seed of the fault injection.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handler, port=0, faults=None, seed=0):
+        super().__init__(('127.0.0.1', port), handler)
+        self.faults = faults or FaultProfile()
+        self.stats = Counter()
+        self.connections = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Base URL of the server."""
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def pick_fault(self):
+        """Returns the fault for the next request, or None."""
+        with self._lock:
+            rng = random.Random(self._rng.random())
+        return self.faults.pick(rng)
+
+    def finish_request(self, request, client_address):
+        """Counts and delays a new connection, then serves its requests."""
+        with self._lock:
+            self.connections += 1
+        if self.faults.handshake:
+            time.sleep(self.faults.handshake)
+        super().finish_request(request, client_address)
+
+    def count(self, outcome):
+        """Counts a request with its outcome."""
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def start(self):
+        """Serves the requests from a daemon thread and returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stops serving and closes the socket."""
+        self.shutdown()
+        self.server_close()
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    """Base handler writing JSON responses with the injected faults."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        """Keeps the load tests output clean."""
+
+    def send_json(self, status, data, headers=None, raw=None):
+        """Writes a JSON response."""
+        body = raw if raw is not None else json.dumps(
+            data, ensure_ascii=False
+        ).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_fault(self, fault):
+        """Writes the response of an injected fault.
+
+        Returns:
+            bool: Whether a fault response was written.
+        """
+        if fault is None:
+            return False
+        self.server.count(fault)
+        if fault == 'malformed':
+            self.send_json(HTTPStatus.OK, None, raw=b'{"homeworks": [')
+        elif fault == 'throttle':
+            retry_after = self.server.faults.retry_after
+            self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {
+                'ok': False,
+                'error_code': HTTPStatus.TOO_MANY_REQUESTS,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            }, headers={'Retry-After': str(retry_after)})
+        else:
+            self.send_json(HTTPStatus.BAD_GATEWAY, {
+                'ok': False,
+                'error_code': HTTPStatus.BAD_GATEWAY,
+                'description': 'Bad Gateway',
+            })
+        return True
+
+
+class PracticumHandler(FakeHandler):
+    """Answers like the homework statuses endpoint of the Practicum API."""
+
+    def do_GET(self):
+        """Answers a homework statuses request."""
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('OAuth ') or len(authorization) < 7:
+            self.server.count('unauthorized')
+            self.send_json(HTTPStatus.UNAUTHORIZED, {
+                'code': 'not_authenticated',
+                'message': 'Учетные данные не были предоставлены.',
+            })
+            return
+        if self.send_fault(self.server.pick_fault()):
+            return
+        query = parse_qs(urlsplit(self.path).query)
+        try:
+            from_date = int(query.get('from_date', ['0'])[0])
+        except ValueError:
+            self.server.count('bad_request')
+            self.send_json(HTTPStatus.BAD_REQUEST, {
+                'code': 'UnknownError',
+                'error': {'error': 'Wrong from_date format'},
+            })
+            return
+        self.server.count('ok')
+        now = time.time()
+        self.send_json(HTTPStatus.OK, {
+            'homeworks': self.server.homeworks(
+                authorization[6:], from_date, now
+            ),
+            'current_date': int(now),
+        })
+
+
+class FakePracticumServer(FakeServer):
+    """Fake Practicum API with a scripted status timeline per token.
+
+    Arguments:
+        timelines (dict): (timestamp, homework) lists by the tokens, the
+            tokens without one get a `scripted_timeline`.
+        step (float): Seconds between the changes of the scripted ones.
+    """
+
+    def __init__(self, port=0, faults=None, seed=0, timelines=None, step=60):
+        super().__init__(PracticumHandler, port, faults, seed)
+        self.started = time.time()
+        self.step = step
+        self.timelines = dict(timelines or {})
+
+    def homeworks(self, token, from_date, now):
+        """Returns the homeworks changed since `from_date`."""
+        if token not in self.timelines:
+            self.timelines[token] = scripted_timeline(
+                token, self.started, self.step
+            )
+        latest = {}
+        for changed_at, homework in self.timelines[token]:
+            if from_date <= changed_at <= now:
+                latest[homework['homework_name']] = dict(
+                    homework, date_updated=time.strftime(
+                        '%Y-%m-%dT%H:%M:%SZ', time.gmtime(changed_at)
+                    )
+                )
+        return list(latest.values())[::-1]
+
+
+class TelegramHandler(FakeHandler):
+    """Answers the `sendMessage` method of the Telegram Bot API."""
+
+    def do_GET(self):
+        """Answers a Bot API method called with GET."""
+        self.answer()
+
+    def do_POST(self):
+        """Answers a Bot API method called with POST."""
+        self.answer()
+
+    def answer(self):
+        """Answers a Bot API method call."""
+        parts = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        params = parse_qs(parts.query)
+        params.update(parse_qs(self.rfile.read(length).decode()))
+        if not parts.path.endswith('/sendMessage'):
+            self.server.count('not_found')
+            self.send_json(HTTPStatus.NOT_FOUND, {
+                'ok': False, 'error_code': 404, 'description': 'Not Found',
+            })
+            return
+        if self.send_fault(self.server.pick_fault()):
+            return
+        chat_id = params.get('chat_id', ['0'])[0]
+        self.server.count('ok')
+        self.server.deliver(chat_id)
+        self.send_json(HTTPStatus.OK, {'ok': True, 'result': {
+            'message_id': self.server.stats['ok'],
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': params.get('text', [''])[0],
+        }})
+
+
+class FakeTelegramServer(FakeServer):
+    """Fake Telegram Bot API counting the messages per chat."""
+
+    def __init__(self, port=0, faults=None, seed=0):
+        super().__init__(TelegramHandler, port, faults, seed)
+        self.messages = Counter()
+
+    @property
+    def api_url(self):
+        """Value for `telebot.apihelper.API_URL`."""
+        return self.url + '/bot{0}/{1}'
+
+    def deliver(self, chat_id):
+        """Counts a message sent to a chat."""
+        with self._lock:
+            self.messages[chat_id] += 1
+
+
+def main(argv=None):
+    """Runs both fake servers until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--practicum-port', type=int, default=8080)
+    parser.add_argument('--telegram-port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    parser.add_argument('--timeout-rate', type=float, default=0)
+    parser.add_argument('--malformed-rate', type=float, default=0)
+    parser.add_argument('--step', type=float, default=60)
+    args = parser.parse_args(argv)
+    faults = FaultProfile(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        timeout_rate=args.timeout_rate,
+        malformed_rate=args.malformed_rate,
+    )
+    practicum = FakePracticumServer(
+        args.practicum_port, faults, step=args.step
+    ).start()
+    telegram = FakeTelegramServer(args.telegram_port, faults).start()
+    print(f'Practicum API: {practicum.url}/api/user_api/homework_statuses/')
+    print(f'Telegram API: {telegram.api_url}')
+    try:
+        while True:
+            time.sleep(10)
+            print(f'practicum {dict(practicum.stats)} '
+                  f'telegram {dict(telegram.stats)}')
+    except KeyboardInterrupt:
+        practicum.stop()
+        telegram.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""End-to-end load test of the polling engine against the fake servers.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --tenants 1000 --duration 30
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from telebot import TeleBot, apihelper
+
+import homework
+from benchmarks.fake_servers import (
+    FakePracticumServer,
+    FakeTelegramServer,
+    FaultProfile,
+)
+from delivery import DeliveryQueue
+from engine import PollingEngine
+from metrics import API_LATENCY, POLLS
+from outbox import Outbox
+from scheduler import AdaptivePolicy
+from state import StateStore
+from tenants import Tenant
+
+
+def run_load_test(
+    tenants=100, duration=10, period=1, faults=None, concurrency=64
+):
+    """Runs the engine for `duration` seconds and returns its statistics.
+
+    Arguments:
+        tenants (int): Number of the simulated tenants.
+        duration (float): Seconds to run the engine for.
+        period (float): Seconds between the polls of a tenant.
+        faults (FaultProfile): Faults injected by both fake servers.
+        concurrency (int): `max_concurrency` of the engine.
+
+    Returns:
+        dict: Request and delivery statistics.
+    """
+    faults = faults or FaultProfile()
+    practicum = FakePracticumServer(faults=faults, step=period * 2).start()
+    telegram = FakeTelegramServer(faults=faults).start()
+    original_endpoint = homework.ENDPOINT
+    original_api_url = apihelper.API_URL
+    homework.ENDPOINT = f'{practicum.url}/api/user_api/homework_statuses/'
+    apihelper.API_URL = telegram.api_url
+    polls_before = POLLS.total()
+    requests_before = API_LATENCY.count()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            bot = TeleBot(token='1234:abcdefg')
+            engine = PollingEngine(
+                [Tenant(f'token{number}', str(number))
+                 for number in range(tenants)],
+                bot,
+                max_concurrency=concurrency,
+                policy=AdaptivePolicy(period, period, period),
+                store=StateStore(os.path.join(directory, 'state.db')),
+                delivery=DeliveryQueue(
+                    bot,
+                    global_rate=10 ** 6,
+                    outbox=Outbox(os.path.join(directory, 'state.db')),
+                ),
+            )
+            started = time.monotonic()
+            try:
+                asyncio.run(asyncio.wait_for(engine.run(), duration))
+            except asyncio.TimeoutError:
+                pass
+            elapsed = time.monotonic() - started
+    finally:
+        homework.ENDPOINT = original_endpoint
+        apihelper.API_URL = original_api_url
+        practicum.stop()
+        telegram.stop()
+    polls = POLLS.total() - polls_before
+    return {
+        'elapsed': elapsed,
+        'polls': polls,
+        'polls_per_second': polls / elapsed,
+        'api_requests': API_LATENCY.count() - requests_before,
+        'practicum': dict(practicum.stats),
+        'telegram': dict(telegram.stats),
+        'chats_notified': len(telegram.messages),
+    }
+
+
+def main(argv=None):
+    """Runs the load test from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--period', type=float, default=1)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    args = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+    results = run_load_test(
+        tenants=args.tenants,
+        duration=args.duration,
+        period=args.period,
+        concurrency=args.concurrency,
+        faults=FaultProfile(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+        ),
+    )
+    for name, value in results.items():
+        print(f'{name:<18} {value}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+from constants import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_HALF_OPEN_PROBES,
+    BREAKER_RECOVERY_TIMEOUT,
+)
+from exceptions import CircuitOpenException
+from metrics import CIRCUIT_STATE
+
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Stops the requests to an endpoint after repeated failures.
+
+    The circuit opens after `failure_threshold` consecutive failures.
+    Once `recovery_timeout` seconds have passed, it lets at most
+    `half_open_probes` requests through at a time and closes on the
+    first success or opens again on a failure.
+
+    Arguments:
+        name (str): Name of the protected endpoint for the metrics.
+        failure_threshold (int): Consecutive failures opening the circuit.
+        recovery_timeout (float): Seconds before the probes are allowed.
+        half_open_probes (int): Simultaneous probes of a half-open circuit.
+        clock (callable): Returns the current monotonic time.
+    """
+
+    def __init__(
+        self,
+        name,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=BREAKER_RECOVERY_TIMEOUT,
+        half_open_probes=BREAKER_HALF_OPEN_PROBES,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._probes = 0
+        self._opened_at = None
+        self._set_state(CLOSED)
+
+    @property
+    def state(self):
+        """Current state of the circuit."""
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def before_request(self):
+        """Reserves a request through the circuit.
+
+        Raises:
+            CircuitOpenException: Exception if the request is not allowed.
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and (
+                self._probes < self.half_open_probes
+            ):
+                self._probes += 1
+                return
+        raise CircuitOpenException(
+            f'Circuit to {self.name} is open after '
+            f'{self.failure_threshold} failures.'
+        )
+
+    def record_success(self):
+        """Closes the circuit after a successful request."""
+        with self._lock:
+            self._failures = 0
+            self._probes = 0
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        """Counts a failed request, opening the circuit when needed."""
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                self._probes = 0
+                self._opened_at = self._clock()
+                self._set_state(OPEN)
+
+    def _refresh(self):
+        if (
+            self._state == OPEN
+            and self._clock() - self._opened_at >= self.recovery_timeout
+        ):
+            self._set_state(HALF_OPEN)
+
+    def _set_state(self, state):
+        self._state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], endpoint=self.name)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url):
+    """Returns the circuit breaker shared by every request to a host."""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
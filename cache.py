@@ -0,0 +1,132 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from typing import NamedTuple
+
+from constants import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL
+
+
+CURRENT_DATE_MEMBER = re.compile(rb'"current_date"\s*:\s*-?\d+')
+
+
+class CachedResponse:
+    """Already parsed API response served from the cache."""
+
+    __slots__ = ('data',)
+
+    status_code = HTTPStatus.OK
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        """Returns the parsed response, the same object on every call."""
+        return self.data
+
+
+class CacheEntry(NamedTuple):
+    """Cached response together with its validators."""
+
+    response: CachedResponse
+    digest: bytes
+    etag: str
+    last_modified: str
+    stored_at: float
+
+
+class ResponseCache:
+    """Cache of the API responses with the HTTP validators support.
+
+    A response younger than `ttl` is served without a request. An older
+    one is revalidated with `If-None-Match` and `If-Modified-Since`, and
+    a body equal to the cached one apart from `current_date` is not
+    parsed again. In both cases the same CachedResponse is returned, so
+    the callers may skip the processing of an unchanged payload.
+
+    Arguments:
+        ttl (float): Seconds a response is served without a request.
+        max_entries (int): Entries kept before the least recently used
+            ones are dropped.
+        clock (callable): Returns the current monotonic time.
+    """
+
+    def __init__(
+        self,
+        ttl=RESPONSE_CACHE_TTL,
+        max_entries=RESPONSE_CACHE_SIZE,
+        clock=time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def fetch(self, send, url, headers=None, params=None, **kwargs):
+        """Sends a GET request unless the cache can answer it.
+
+        Arguments:
+            send (callable): Sends the request like `requests.get`.
+            url (str): Requested URL.
+            headers (dict): Request headers.
+            params (dict): Query string parameters.
+
+        Returns:
+            CachedResponse or requests.Response: The cached response, or
+                the original one when its status code is not 200 or 304.
+        """
+        headers = dict(headers or {})
+        key = (
+            url,
+            headers.get('Authorization'),
+            tuple(sorted((params or {}).items())),
+        )
+        entry = self._get(key)
+        if entry is not None:
+            if self._clock() - entry.stored_at < self.ttl:
+                return entry.response
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        response = send(url, headers=headers, params=params, **kwargs)
+        if (
+            entry is not None
+            and response.status_code == HTTPStatus.NOT_MODIFIED
+        ):
+            self._put(key, entry._replace(stored_at=self._clock()))
+            return entry.response
+        if response.status_code != HTTPStatus.OK:
+            return response
+        digest = hashlib.sha256(
+            CURRENT_DATE_MEMBER.sub(b'', response.content)
+        ).digest()
+        if entry is None or entry.digest != digest:
+            cached = CachedResponse(response.json())
+        else:
+            cached = entry.response
+        self._put(key, CacheEntry(
+            cached,
+            digest,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            self._clock(),
+        ))
+        return cached
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
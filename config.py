@@ -0,0 +1,294 @@
+import json
+import logging
+import os
+import threading
+import tomllib
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
+
+from constants import (
+    DIGEST_WINDOW,
+    IDLE_PERIOD,
+    RETRY_PERIOD,
+    REVIEWING_PERIOD,
+)
+from exceptions import ConfigException
+from messages import MESSAGES
+from metrics import CONFIG_RELOADS
+from scheduler import AdaptivePolicy
+from tenants import Tenant
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Validated settings of the engine.
+
+    The Telegram token comes from the environment, which is the same
+    for the whole life of the process, the tenants and the tunable
+    settings from the tenants file, which can be reloaded.
+    """
+
+    telegram_token: str
+    tenants: tuple
+    tenants_file: Optional[str] = None
+    reviewing_period: float = REVIEWING_PERIOD
+    default_period: float = RETRY_PERIOD
+    idle_period: float = IDLE_PERIOD
+    digest_window: float = DIGEST_WINDOW
+
+    def policy(self):
+        """Returns the poll scheduling policy of the settings."""
+        return AdaptivePolicy(
+            reviewing_period=self.reviewing_period,
+            default_period=self.default_period,
+            idle_period=self.idle_period,
+        )
+
+
+# Settings of the tenants file with their minimum values.
+TUNABLE = {
+    'reviewing_period': 1,
+    'default_period': 1,
+    'idle_period': 1,
+    'digest_window': 0,
+}
+
+
+class TenantDiff(NamedTuple):
+    """Tenants added, removed and changed by a new configuration."""
+
+    added: tuple
+    removed: tuple
+    changed: tuple
+
+    def __bool__(self):
+        """Tells whether any tenant is affected."""
+        return bool(self.added or self.removed or self.changed)
+
+
+def diff_tenants(old, new):
+    """Compares two tenant lists by the tenant keys.
+
+    A tenant with a new Practicum token or chat is a removed one and an
+    added one, a tenant with a new locale is a changed one.
+    """
+    old = {tenant.key: tenant for tenant in old}
+    new = {tenant.key: tenant for tenant in new}
+    return TenantDiff(
+        added=tuple(tenant for key, tenant in new.items() if key not in old),
+        removed=tuple(
+            tenant for key, tenant in old.items() if key not in new
+        ),
+        changed=tuple(
+            tenant for key, tenant in new.items()
+            if key in old and old[key] != tenant
+        ),
+    )
+
+
+def read_tenants_file(path):
+    """Returns the content of a TOML or a JSON tenants file.
+
+    A JSON file may also be a bare list of the tenants.
+
+    Raises:
+        OSError: Exception if the file cannot be read.
+        ValueError: Exception if the file cannot be parsed.
+
+    Returns:
+        dict: Optional `settings` table and `tenants` list.
+    """
+    with open(path, 'rb') as file:
+        if path.endswith('.json'):
+            content = json.load(file)
+        else:
+            content = tomllib.load(file)
+    if isinstance(content, list):
+        return {'tenants': content}
+    if not isinstance(content, dict):
+        raise ValueError('expected a table or a list of the tenants')
+    return content
+
+
+def parse_tenant(record, path):
+    """Returns a Tenant from a record of the tenants file.
+
+    Arguments:
+        record (dict): Record of the tenant.
+        path (str): Position of the record for the error messages.
+
+    Returns:
+        tuple: The Tenant or None and a list of errors.
+    """
+    if not isinstance(record, dict):
+        return None, [f'{path}: expected a table']
+    errors = []
+    values = {}
+    for name in ('practicum_token', 'chat_id'):
+        value = record.get(name)
+        if isinstance(value, int) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str) or not value:
+            errors.append(f'{path}.{name}: required string')
+        values[name] = value
+    locale = record.get('locale')
+    if locale is not None and locale not in MESSAGES.locales:
+        errors.append(f'{path}.locale: unknown locale {locale!r}')
+    unknown = set(record) - {'practicum_token', 'chat_id', 'locale'}
+    if unknown:
+        errors.append(f'{path}: unknown keys {", ".join(sorted(unknown))}')
+    if errors:
+        return None, errors
+    return Tenant(values['practicum_token'], values['chat_id'], locale), []
+
+
+def parse_tenants(records):
+    """Returns the tenants of the tenants file and the errors."""
+    if not isinstance(records, list) or not records:
+        return [], ['tenants: expected a non-empty list']
+    tenants = []
+    errors = []
+    seen = set()
+    for number, record in enumerate(records):
+        tenant, tenant_errors = parse_tenant(record, f'tenants[{number}]')
+        errors.extend(tenant_errors)
+        if tenant is None:
+            continue
+        if tenant.key in seen:
+            errors.append(
+                f'tenants[{number}]: duplicate of chat {tenant.chat_id}'
+            )
+        seen.add(tenant.key)
+        tenants.append(tenant)
+    return tenants, errors
+
+
+def parse_settings(settings):
+    """Returns the tunable settings of the tenants file and the errors."""
+    if not isinstance(settings, dict):
+        return {}, ['settings: expected a table']
+    values = {}
+    errors = []
+    for name, value in settings.items():
+        if name not in TUNABLE:
+            errors.append(f'settings.{name}: unknown setting')
+        elif (
+            not isinstance(value, (int, float)) or isinstance(value, bool)
+            or value < TUNABLE[name]
+        ):
+            errors.append(
+                f'settings.{name}: expected a number of at least '
+                f'{TUNABLE[name]}'
+            )
+        else:
+            values[name] = value
+    return values, errors
+
+
+def load_config(environ=None):
+    """Loads and validates the configuration as a whole.
+
+    Without `TENANTS_FILE` the single tenant of `PRACTICUM_TOKEN` and
+    `TELEGRAM_CHAT_ID` is served.
+
+    Arguments:
+        environ (dict): Environment variables, `os.environ` if None.
+
+    Raises:
+        ConfigException: Exception with every problem found.
+
+    Returns:
+        Config: The configuration.
+    """
+    environ = os.environ if environ is None else environ
+    errors = []
+    telegram_token = environ.get('TELEGRAM_TOKEN')
+    if not telegram_token:
+        errors.append('TELEGRAM_TOKEN: required')
+    tenants_file = environ.get('TENANTS_FILE') or None
+    tenants = []
+    settings = {}
+    if tenants_file is None:
+        for name in ('PRACTICUM_TOKEN', 'TELEGRAM_CHAT_ID'):
+            if not environ.get(name):
+                errors.append(f'{name}: required without TENANTS_FILE')
+        tenants.append(Tenant(
+            environ.get('PRACTICUM_TOKEN'), environ.get('TELEGRAM_CHAT_ID')
+        ))
+    else:
+        try:
+            content = read_tenants_file(tenants_file)
+        except (OSError, ValueError) as error:
+            raise ConfigException(errors + [f'{tenants_file}: {error}'])
+        settings, settings_errors = parse_settings(
+            content.get('settings', {})
+        )
+        errors.extend(settings_errors)
+        tenants, tenants_errors = parse_tenants(content.get('tenants'))
+        errors.extend(tenants_errors)
+    if errors:
+        raise ConfigException(errors)
+    return Config(
+        telegram_token=telegram_token,
+        tenants=tuple(tenants),
+        tenants_file=tenants_file,
+        **settings,
+    )
+
+
+class ConfigReloader:
+    """Keeps the last valid configuration and reloads it on demand.
+
+    An invalid configuration is logged and ignored, so the engine keeps
+    running with the previous one. Safe to use from several threads.
+
+    Arguments:
+        load (callable): Returns a new Config or raises ConfigException.
+    """
+
+    def __init__(self, load=load_config):
+        self._load = load
+        self._lock = threading.Lock()
+        self.config = load()
+        self._stamp = self._file_stamp()
+
+    def changed(self):
+        """Tells whether the tenants file changed since the last load."""
+        return self._file_stamp() != self._stamp
+
+    def reload(self):
+        """Loads the configuration again.
+
+        Returns:
+            Config: The new configuration, or None if it is invalid or
+                the same as the current one.
+        """
+        with self._lock:
+            stamp = self._file_stamp()
+            try:
+                config = self._load()
+            except ConfigException as error:
+                self._stamp = stamp
+                CONFIG_RELOADS.inc(result='invalid')
+                logger.error('Configuration is not reloaded: %s', error)
+                return None
+            self._stamp = stamp
+            if config == self.config:
+                CONFIG_RELOADS.inc(result='unchanged')
+                return None
+            self.config = config
+            CONFIG_RELOADS.inc(result='applied')
+            return config
+
+    def _file_stamp(self):
+        path = self.config.tenants_file
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
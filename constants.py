@@ -1,13 +1,83 @@
 import os
 
+ENV_FILE = os.getenv('ENV_FILE', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '.env'
+))
+if os.path.isfile(ENV_FILE):
+    # Read before the settings below, dotenv is not imported without a file.
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
+
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 RETRY_PERIOD = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+)
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+MAX_CONCURRENCY = 64
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = MAX_CONCURRENCY
+HTTP_IDLE_TIMEOUT = 300
+REVIEWING_PERIOD = 60
+IDLE_PERIOD = 3600
+POLL_JITTER = 0.1
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'state.db')
+STATE_BATCH_SIZE = 100
+STATE_FLUSH_INTERVAL = 5
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_CHAT_RATE = 1
+DELIVERY_WORKERS = 8
+DELIVERY_MAX_ATTEMPTS = 5
+DELIVERY_DRAIN_TIMEOUT = 10
+RESPONSE_CACHE_TTL = 30
+RESPONSE_CACHE_SIZE = 10000
+BACKFILL_CHUNK_SIZE = 64 * 1024
+BACKFILL_MAX_ITEM_SIZE = 1024 * 1024
+BACKFILL_NEW_TENANTS = True
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = os.getenv('METRICS_PORT')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RECOVERY_TIMEOUT = 60
+BREAKER_HALF_OPEN_PROBES = 1
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30
+RETRY_BUDGET = 60
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 15
+TELEGRAM_TIMEOUT = 15
+CYCLE_BUDGET = 60
+CYCLE_GRACE = 5
+LOG_FILE = os.getenv('LOG_FILE', 'program.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_ROTATE_INTERVAL = 24 * 60 * 60
+LOG_QUEUE_SIZE = 10000
+LOG_DEDUP_WINDOW = 60
+LOG_DEDUP_MAX_FINGERPRINTS = 10000
+DEFAULT_LOCALE = os.getenv('LOCALE', 'ru')
+SHARD_DB_PATH = os.getenv('SHARD_DB_PATH')
+WORKER_ID = os.getenv('WORKER_ID')
+SHARD_LEASE_TTL = 30
+SHARD_HEARTBEAT = 10
+SHARD_REPLICAS = 100
+OUTBOX_RETENTION = 7 * 24 * 60 * 60
+DELIVERY_RETRY_DELAY = 1
+DIGEST_WINDOW = 60
+TELEGRAM_MESSAGE_LIMIT = 4096
+SHUTDOWN_TIMEOUT = 10
+CONFIG_POLL_INTERVAL = 5
+TELEGRAM_POOL_MAXSIZE = DELIVERY_WORKERS
+TELEGRAM_CONNECT_RETRIES = 2
+# ReplyKeyboardRemove markup serialized once for every message.
+REMOVE_KEYBOARD = '{"remove_keyboard": true}'
@@ -0,0 +1,85 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from constants import CONNECT_TIMEOUT, READ_TIMEOUT
+from lazy import lazy_import
+
+
+requests = lazy_import('requests')
+current_deadline = ContextVar('current_deadline', default=None)
+shutdown_deadline = None
+shutdown_started = threading.Event()
+
+
+class Deadline:
+    """Point in time every network call of a cycle has to finish by.
+
+    Arguments:
+        budget (float): Seconds from now to the deadline.
+        clock (callable): Returns the current monotonic time.
+    """
+
+    __slots__ = ('expires_at', '_clock')
+
+    def __init__(self, budget, clock=time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self):
+        """Returns the seconds left before the deadline."""
+        return self.expires_at - self._clock()
+
+
+def start_shutdown(budget):
+    """Limits every network call of the process to `budget` seconds.
+
+    The waits in `sleep` end at once.
+    """
+    global shutdown_deadline
+    shutdown_deadline = Deadline(budget)
+    shutdown_started.set()
+
+
+def sleep(seconds):
+    """Sleeps for `seconds` or until the shutdown starts."""
+    shutdown_started.wait(seconds)
+
+
+def time_left():
+    """Returns the seconds before the nearest deadline or None.
+
+    The nearest one is the deadline of the current cycle or the one of
+    the shutdown.
+    """
+    deadlines = [
+        deadline.remaining()
+        for deadline in (current_deadline.get(), shutdown_deadline)
+        if deadline is not None
+    ]
+    return min(deadlines) if deadlines else None
+
+
+def clip(seconds):
+    """Limits a timeout by the deadline of the current cycle.
+
+    Arguments:
+        seconds (float): Timeout without a deadline.
+
+    Raises:
+        requests.Timeout: Exception if the deadline has already passed.
+
+    Returns:
+        float: The timeout to be used.
+    """
+    remaining = time_left()
+    if remaining is None:
+        return seconds
+    if remaining <= 0:
+        raise requests.Timeout('Deadline of the cycle is exceeded.')
+    return min(seconds, remaining)
+
+
+def get_timeout(connect=CONNECT_TIMEOUT, read=READ_TIMEOUT):
+    """Returns the (connect, read) timeouts limited by the deadline."""
+    return clip(connect), clip(read)
@@ -0,0 +1,330 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Callable, NamedTuple, Optional
+
+import homework
+from constants import (
+    DELIVERY_MAX_ATTEMPTS,
+    DELIVERY_RETRY_DELAY,
+    DELIVERY_WORKERS,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GLOBAL_RATE,
+)
+from exceptions import SendTelegramException
+from lazy import lazy_import
+from metrics import DEAD_LETTERS, ERRORS
+from outbox import DELIVERED, NEW
+from tenants import Tenant, current_tenant
+
+
+telebot = lazy_import('telebot')
+logger = logging.getLogger(__name__)
+
+PERMANENT_ERRORS = (400, 401, 403, 404)
+
+
+class TokenBucket:
+    """Token bucket rate limiter handing out reservations.
+
+    Arguments:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum amount of stored tokens.
+        clock (callable): Returns the current monotonic time.
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', '_clock')
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self.updated = clock()
+
+    def reserve(self):
+        """Takes a token, possibly one which is not available yet.
+
+        Returns:
+            float: Seconds to wait before the token may be used.
+        """
+        now = self._clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+
+class Delivery(NamedTuple):
+    """A message waiting to be sent to a tenant."""
+
+    tenant: Tenant
+    text: str
+    on_delivered: Optional[Callable] = None
+    attempt: int = 1
+    outbox_id: Optional[int] = None
+
+
+def get_retry_after(error):
+    """Returns the seconds Telegram asked to wait or None.
+
+    Arguments:
+        error (SendTelegramException): Failed delivery exception.
+    """
+    cause = error.__cause__
+    if (
+        isinstance(cause, telebot.apihelper.ApiTelegramException)
+        and cause.error_code == 429
+    ):
+        return cause.result_json.get('parameters', {}).get('retry_after', 1)
+    return None
+
+
+def get_retry_delay(error, attempt, base_delay=DELIVERY_RETRY_DELAY):
+    """Returns the seconds to wait before sending a message again.
+
+    Arguments:
+        error (SendTelegramException): Failed delivery exception.
+        attempt (int): Number of the failed attempt.
+        base_delay (float): Delay after the first failed attempt.
+
+    Returns:
+        float: The delay, or None if the message will never be accepted.
+    """
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        return retry_after
+    cause = error.__cause__
+    if (
+        isinstance(cause, telebot.apihelper.ApiTelegramException)
+        and cause.error_code in PERMANENT_ERRORS
+    ):
+        return None
+    return base_delay * 2 ** (attempt - 1)
+
+
+class DeliveryQueue:
+    """Sends the messages to Telegram independently from the polling.
+
+    The messages are sent by a pool of workers respecting the global and
+    per chat rate limits of the Bot API. A message rejected with the 429
+    status code is sent again after the `retry_after` seconds, the other
+    failed ones after an exponential backoff, unless Telegram will never
+    accept them.
+
+    With an `outbox` every message is committed to it before being
+    queued and its delivery or final failure is recorded there, so the
+    undelivered messages are sent again by `resume` after a restart.
+
+    Arguments:
+        bot (telebot.TeleBot): Telegram bot instance.
+        workers (int): Number of the concurrent senders.
+        global_rate (float): Messages per second to all the chats.
+        chat_rate (float): Messages per second to a single chat.
+        max_attempts (int): Attempts to send a message before it is
+            moved to the dead letters.
+        sleep (coroutine function): Used to wait for the rate limits and
+            the retries.
+        clock (callable): Returns the current monotonic time.
+        outbox (Outbox): Durable log of the messages or None.
+        retry_delay (float): Delay after the first failed attempt.
+    """
+
+    def __init__(
+        self,
+        bot,
+        workers=DELIVERY_WORKERS,
+        global_rate=TELEGRAM_GLOBAL_RATE,
+        chat_rate=TELEGRAM_CHAT_RATE,
+        max_attempts=DELIVERY_MAX_ATTEMPTS,
+        sleep=asyncio.sleep,
+        clock=time.monotonic,
+        outbox=None,
+        retry_delay=DELIVERY_RETRY_DELAY,
+    ):
+        self.bot = bot
+        self.outbox = outbox
+        self.retry_delay = retry_delay
+        self.workers = workers
+        self.chat_rate = chat_rate
+        self.max_attempts = max_attempts
+        self.sleep = sleep
+        self._clock = clock
+        self._global_bucket = TokenBucket(
+            global_rate, capacity=global_rate, clock=clock
+        )
+        self._chat_buckets = {}
+        self._queue = None
+        self._loop = None
+        self._tasks = []
+        self._queued = set()
+        self._in_progress = 0
+        self._retries = set()
+
+    def start(self):
+        """Starts the workers in the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    def put(self, tenant, text, on_delivered=None, key=None):
+        """Schedules a message for delivery. Safe to call from any thread.
+
+        Arguments:
+            tenant (Tenant): Tenant to send the message to.
+            text (str): Message to be sent.
+            on_delivered (callable): Called without arguments once the
+                message is sent.
+            key (str): Idempotency key, a message with the key of an
+                already stored one is not sent again.
+        """
+        delivery = Delivery(tenant, text, on_delivered)
+        if self.outbox is not None:
+            outbox_id, state = self.outbox.add(tenant.key, text, key)
+            if state != NEW:
+                logger.debug('Message %s is already %s.', outbox_id, state)
+                if state == DELIVERED and on_delivered is not None:
+                    on_delivered()
+                return
+            delivery = delivery._replace(outbox_id=outbox_id)
+        self._enqueue(delivery)
+
+    def resume(self, tenants):
+        """Queues the undelivered messages of the tenants from the outbox.
+
+        Safe to call from any thread.
+        """
+        if self.outbox is None:
+            return
+        tenants = {tenant.key: tenant for tenant in tenants}
+        for message in self.outbox.pending(tenants):
+            if message.id not in self._queued:
+                self._enqueue(Delivery(
+                    tenants[message.tenant_key],
+                    message.text,
+                    attempt=message.attempts + 1,
+                    outbox_id=message.id,
+                ))
+
+    def _enqueue(self, delivery):
+        if delivery.outbox_id is not None:
+            self._queued.add(delivery.outbox_id)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is self._loop:
+            self._queue.put_nowait(delivery)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, delivery)
+
+    def qsize(self):
+        """Returns the number of the messages waiting for a worker."""
+        return self._queue.qsize()
+
+    def undelivered(self):
+        """Returns the number of the messages waiting or being sent."""
+        return (
+            self._queue.qsize() + self._in_progress + len(self._retries)
+        )
+
+    async def join(self):
+        """Waits until every scheduled message is processed.
+
+        The messages waiting to be retried are waited for as well.
+        """
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.wait(self._retries)
+
+    async def stop(self):
+        """Cancels the workers and the pending retries."""
+        tasks = self._tasks + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        while True:
+            delivery = await self._queue.get()
+            self._in_progress += 1
+            try:
+                await self._deliver(delivery)
+            except Exception as error:
+                logger.exception('Delivery worker failure: %s', error)
+            finally:
+                self._in_progress -= 1
+                self._queue.task_done()
+
+    async def _deliver(self, delivery):
+        chat_id = delivery.tenant.chat_id
+        if chat_id not in self._chat_buckets:
+            self._chat_buckets[chat_id] = TokenBucket(
+                self.chat_rate, clock=self._clock
+            )
+        delay = max(
+            self._global_bucket.reserve(),
+            self._chat_buckets[chat_id].reserve(),
+        )
+        if delay:
+            await self.sleep(delay)
+        context = contextvars.copy_context()
+        context.run(current_tenant.set, delivery.tenant)
+        try:
+            await self._loop.run_in_executor(
+                None, context.run, self._send, delivery
+            )
+        except SendTelegramException as error:
+            ERRORS.inc(exception=type(error).__name__)
+            delay = get_retry_delay(error, delivery.attempt, self.retry_delay)
+            if delay is None or delivery.attempt >= self.max_attempts:
+                await self._record(delivery, error, dead=True)
+                return
+            await self._record(delivery, error, dead=False)
+            self._retry_later(
+                delay, delivery._replace(attempt=delivery.attempt + 1)
+            )
+            return
+        self._queued.discard(delivery.outbox_id)
+        if delivery.on_delivered is not None:
+            delivery.on_delivered()
+
+    def _retry_later(self, delay, delivery):
+        # The worker is free for the other chats in the meantime.
+        task = asyncio.create_task(self._requeue(delay, delivery))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _requeue(self, delay, delivery):
+        await self.sleep(delay)
+        self._queue.put_nowait(delivery)
+
+    def _send(self, delivery):
+        homework.send_message(self.bot, delivery.text)
+        if delivery.outbox_id is not None:
+            self.outbox.mark_delivered(delivery.outbox_id)
+
+    async def _record(self, delivery, error, dead):
+        if dead:
+            DEAD_LETTERS.inc()
+            logger.error(
+                'Message is given up after %d attempts: %s',
+                delivery.attempt, error
+            )
+            self._queued.discard(delivery.outbox_id)
+        if delivery.outbox_id is None:
+            return
+        mark = self.outbox.mark_dead if dead else self.outbox.mark_failed
+        await self._loop.run_in_executor(
+            None, mark, delivery.outbox_id, error
+        )
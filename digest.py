@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import threading
+from typing import Callable, NamedTuple, Optional
+
+from constants import DIGEST_WINDOW, TELEGRAM_MESSAGE_LIMIT
+
+
+SEPARATOR = '\n\n'
+ELLIPSIS = '…'
+
+
+class Change(NamedTuple):
+    """A rendered status change waiting in a digest."""
+
+    text: str
+    on_delivered: Optional[Callable] = None
+    key: Optional[str] = None
+
+
+def pack(changes, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Splits the changes into the fewest messages under the limit.
+
+    The changes keep their order, a change longer than the limit is cut.
+
+    Returns:
+        list: Lists of the changes of every message.
+    """
+    messages = []
+    size = limit
+    for change in changes:
+        if len(change.text) > limit:
+            change = change._replace(
+                text=change.text[:limit - len(ELLIPSIS)] + ELLIPSIS
+            )
+        if size + len(SEPARATOR) + len(change.text) > limit:
+            messages.append([])
+            size = -len(SEPARATOR)
+        messages[-1].append(change)
+        size += len(SEPARATOR) + len(change.text)
+    return messages
+
+
+def combine(changes):
+    """Returns the text, callback and idempotency key of a digest."""
+    if len(changes) == 1:
+        return changes[0]
+    callbacks = [
+        change.on_delivered for change in changes
+        if change.on_delivered is not None
+    ]
+
+    def on_delivered():
+        for callback in callbacks:
+            callback()
+
+    keys = [change.key for change in changes]
+    key = None
+    if None not in keys:
+        key = 'digest:' + hashlib.sha256(
+            '|'.join(keys).encode()
+        ).hexdigest()[:32]
+    return Change(
+        SEPARATOR.join(change.text for change in changes), on_delivered, key
+    )
+
+
+class DigestBuffer:
+    """Coalesces the status changes of a chat into digest messages.
+
+    The first change of a chat opens a window of `window` seconds, the
+    changes arriving in it are sent together in as few messages as the
+    Telegram length limit allows. A homework changing several times in
+    the window is only reported with its last status.
+
+    The held changes are only in memory, so the buffer keeps the cursor
+    the tenant was polled from before the first of them: persisting it
+    instead of the newer one lets a restarted process find them again.
+
+    Arguments:
+        delivery (DeliveryQueue): Sends the digests.
+        window (float): Seconds the changes are held for, 0 sends every
+            change right away.
+        limit (int): Maximum characters of a message.
+        on_flush (callable): Called with the tenant once its held changes
+            are handed to the delivery, or None.
+    """
+
+    def __init__(
+        self, delivery, window=DIGEST_WINDOW, limit=TELEGRAM_MESSAGE_LIMIT,
+        on_flush=None,
+    ):
+        self.delivery = delivery
+        self.window = window
+        self.limit = limit
+        self.on_flush = on_flush
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._loop = None
+
+    def start(self):
+        """Binds the buffer to the running event loop."""
+        self._loop = asyncio.get_running_loop()
+
+    def add(
+        self, tenant, homework_key, text, on_delivered=None, key=None,
+        cursor=None,
+    ):
+        """Holds a status change for the digest. Safe to call from any thread.
+
+        Arguments:
+            tenant (Tenant): Tenant to send the change to.
+            homework_key (str): Key of the changed homework.
+            text (str): Rendered change.
+            on_delivered (callable): Called once the change is sent.
+            key (str): Idempotency key of the change.
+            cursor (int): Cursor the change was polled from.
+        """
+        change = Change(text, on_delivered, key)
+        if not self.window:
+            self.delivery.put(tenant, *change)
+            return
+        with self._lock:
+            opened = tenant.key not in self._pending
+            if opened:
+                self._pending[tenant.key] = (tenant, {}, cursor)
+            changes = self._pending[tenant.key][1]
+            changes.pop(homework_key, None)
+            changes[homework_key] = change
+        if opened:
+            self._loop.call_soon_threadsafe(
+                self._loop.call_later, self.window, self._flush_later,
+                tenant.key
+            )
+
+    def held_cursor(self, tenant_key):
+        """Returns the cursor of the held changes of a tenant or None."""
+        with self._lock:
+            return self._pending.get(tenant_key, (None, None, None))[2]
+
+    def flush(self, tenant_key):
+        """Sends the held changes of a tenant."""
+        with self._lock:
+            tenant, changes, _ = self._pending.pop(
+                tenant_key, (None, None, None)
+            )
+        if not changes:
+            return
+        for message in pack(changes.values(), self.limit):
+            self.delivery.put(tenant, *combine(message))
+        if self.on_flush is not None:
+            self.on_flush(tenant)
+
+    def flush_all(self):
+        """Sends the held changes of every tenant."""
+        for tenant_key in list(self._pending):
+            self.flush(tenant_key)
+
+    def _flush_later(self, tenant_key):
+        self._loop.run_in_executor(None, self.flush, tenant_key)
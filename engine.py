@@ -0,0 +1,602 @@
+import asyncio
+import contextvars
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import homework
+import backfill
+from constants import (
+    BACKFILL_NEW_TENANTS,
+    CONFIG_POLL_INTERVAL,
+    CYCLE_BUDGET,
+    CYCLE_GRACE,
+    DIGEST_WINDOW,
+    DELIVERY_DRAIN_TIMEOUT,
+    MAX_CONCURRENCY,
+    METRICS_PORT,
+    SHARD_DB_PATH,
+)
+from cache import ResponseCache
+from config import ConfigReloader, diff_tenants
+from deadline import Deadline, current_deadline, time_left
+from delivery import DeliveryQueue
+from digest import DigestBuffer
+from exceptions import (
+    CircuitOpenException,
+    ConfigException,
+    InvalidTokenException,
+)
+from http_client import PooledClient, current_client
+from lazy import lazy_import
+from log_config import setup_logging
+from metrics import (
+    CYCLE_DURATION,
+    DELIVERY_QUEUE_DEPTH,
+    ERRORS,
+    POLLS,
+    TIMEOUTS,
+    start_server,
+)
+from outbox import Outbox, idempotency_key
+from retry import RetryPolicy
+from scheduler import AdaptivePolicy
+from schema import VALIDATOR
+from sharding import ShardCoordinator
+from shutdown import SHUTDOWN, SIGNALS
+from state import HomeworkIndex, StateStore
+from tenants import current_tenant
+
+
+telebot = lazy_import('telebot')
+logger = logging.getLogger(__name__)
+
+
+class TenantState:
+    """Polling state of a single tenant.
+
+    Arguments:
+        tenant (Tenant): The tenant being polled.
+        record (TenantRecord): The persisted state of the tenant or None.
+        timestamp (int): The cursor to start from without a record.
+    """
+
+    __slots__ = (
+        'tenant', 'timestamp', 'last_message', 'last_status', 'index',
+        'last_response', 'needs_backfill', 'disabled',
+    )
+
+    def __init__(self, tenant, record, timestamp):
+        self.tenant = tenant
+        self.disabled = False
+        self.restore(record, timestamp)
+
+    def restore(self, record, timestamp):
+        """Resets the state to a persisted one."""
+        self.timestamp = timestamp
+        self.index = HomeworkIndex()
+        self.needs_backfill = record is None
+        if record is not None:
+            self.timestamp = record.current_date or timestamp
+            self.index = HomeworkIndex(record.statuses)
+        self.last_message = ''
+        self.last_status = None
+        self.last_response = None
+        self.guess_last_status()
+
+    def guess_last_status(self):
+        """Restores the last status for the scheduler from the index."""
+        if 'reviewing' in self.index.statuses():
+            self.last_status = 'reviewing'
+
+
+class PollingEngine:
+    """Polls the Practicum API for many tenants in a single process.
+
+    Every tenant gets its own polling coroutine, while the blocking
+    pipeline functions from `homework` run in a thread pool. The amount
+    of cycles running at the same time is bounded by `max_concurrency`.
+
+    Arguments:
+        tenants (list): Tenant instances to be served.
+        bot (telebot.TeleBot): Telegram bot instance shared by the tenants.
+        max_concurrency (int): Maximum number of simultaneous poll cycles.
+        policy (AdaptivePolicy): Chooses the delay between two poll cycles.
+        sleep (coroutine function): Used to wait between the poll cycles.
+        client (PooledClient): HTTP client shared by the tenants.
+        store (StateStore): Storage of the cursors and delivered statuses.
+        delivery (DeliveryQueue): Sends the messages to the tenants.
+        backfill_new (bool): Whether to rebuild the state of the tenants
+            without a stored one from their whole history.
+        cycle_budget (float): Seconds every network call of a poll cycle
+            has to finish in, the cycle is abandoned after `CYCLE_GRACE`
+            more seconds.
+        shard (ShardCoordinator): Splits the tenants with the other
+            workers, every tenant is served by this worker if None.
+        digest_window (float): Seconds the status changes of a chat are
+            coalesced for into a single digest, 0 disables the digests.
+        reloader (ConfigReloader): Reloads the configuration when its
+            file changes or on `reload`, never if None.
+    """
+
+    def __init__(
+        self,
+        tenants,
+        bot,
+        max_concurrency=MAX_CONCURRENCY,
+        policy=None,
+        sleep=asyncio.sleep,
+        client=None,
+        store=None,
+        delivery=None,
+        backfill_new=BACKFILL_NEW_TENANTS,
+        cycle_budget=CYCLE_BUDGET,
+        shard=None,
+        digest_window=DIGEST_WINDOW,
+        reloader=None,
+    ):
+        self.tenants = list(tenants)
+        self.bot = bot
+        self.max_concurrency = max_concurrency
+        self.policy = policy or AdaptivePolicy()
+        self.sleep = sleep
+        self.client = client or PooledClient(
+            pool_maxsize=max_concurrency,
+            cache=ResponseCache(),
+            retry=RetryPolicy(),
+        )
+        self.store = store or StateStore()
+        self.delivery = delivery or DeliveryQueue(bot, outbox=Outbox())
+        self.digests = DigestBuffer(
+            self.delivery, digest_window, on_flush=self._digest_flushed
+        )
+        self.backfill_new = backfill_new
+        self.cycle_budget = cycle_budget
+        self.shard = shard
+        self.reloader = reloader
+        self._executor = None
+        self._shard_executor = None
+        self._semaphore = None
+        self._states = {}
+        self._tasks = {}
+        self._background = set()
+        self._stopping = asyncio.Event()
+        self._finished = asyncio.Event()
+        self._failure = None
+        self._reconfiguring = asyncio.Lock()
+
+    async def run(self):
+        """Runs the poll loops of all the tenants until stopped."""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.delivery.start()
+        self.digests.start()
+        DELIVERY_QUEUE_DEPTH.set_function(self.delivery.qsize)
+        try:
+            # The leases are renewed on their own thread, so the busy
+            # pollers cannot delay them past their expiry.
+            with ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix='poller',
+            ) as executor, ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='shard'
+            ) as shard_executor:
+                self._executor = executor
+                self._shard_executor = shard_executor
+                records = self.store.load()
+                timestamp = int(time.time())
+                self._states = {
+                    tenant.key: TenantState(
+                        tenant, records.get(tenant.key), timestamp
+                    )
+                    for tenant in self.tenants
+                }
+                if self.delivery.outbox is not None:
+                    await self._run_blocking(self.delivery.outbox.purge)
+                try:
+                    if self.shard is not None:
+                        await self._run_rebalance()
+                        self._start(self._rebalance_forever())
+                    else:
+                        await self._run_blocking(
+                            self.delivery.resume, self.tenants
+                        )
+                    if self.reloader is not None:
+                        self._start(self._reload_forever())
+                    for key, state in self._states.items():
+                        self._tasks[key] = self._start(
+                            self._poll_forever(state)
+                        )
+                    self._check_finished()
+                    await self._finished.wait()
+                    if self._failure is not None:
+                        raise self._failure
+                finally:
+                    self._stopping.set()
+                    await asyncio.gather(
+                        *self._background, return_exceptions=True
+                    )
+        finally:
+            try:
+                self.digests.flush_all()
+                await self._drain()
+            finally:
+                await self.delivery.stop()
+                self.client.close()
+                self.store.close()
+                if self.delivery.outbox is not None:
+                    self.delivery.outbox.close()
+                if self.shard is not None:
+                    self.shard.close()
+
+    async def _drain(self):
+        """Waits for the queued messages, at most until the shutdown ends.
+
+        The messages left undelivered stay in the outbox.
+        """
+        timeout = DELIVERY_DRAIN_TIMEOUT
+        remaining = time_left()
+        if remaining is not None:
+            timeout = max(0, min(timeout, remaining))
+        try:
+            await asyncio.wait_for(self.delivery.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                'Stopped with %d messages undelivered.',
+                self.delivery.undelivered()
+            )
+
+    def stop(self):
+        """Stops the engine gracefully.
+
+        The loops stop waiting at once and do not start new cycles, the
+        running ones finish and the held digests are sent before `run`
+        returns.
+        """
+        self._stopping.set()
+
+    async def reload(self):
+        """Reloads the configuration and applies it if it changed."""
+        try:
+            config = await self._run_blocking(self.reloader.reload)
+            if config is not None:
+                await self.reconfigure(config)
+        except Exception as error:
+            ERRORS.inc(exception=type(error).__name__)
+            logger.error('Reloading the configuration failed: %s', error)
+
+    def request_reload(self):
+        """Schedules a `reload` from the event loop, like on SIGHUP."""
+        if self.reloader is not None and not self._stopping.is_set():
+            self._start(self.reload())
+
+    async def reconfigure(self, config):
+        """Applies a configuration without restarting the other tenants.
+
+        Only the poll loops of the added and removed tenants are started
+        and stopped, a changed tenant is picked up by its next cycle. A
+        cycle of a removed tenant already running in the pool completes.
+
+        Arguments:
+            config (Config): The new configuration.
+        """
+        async with self._reconfiguring:
+            diff = diff_tenants(self.tenants, config.tenants)
+            self.tenants = list(config.tenants)
+            self.policy = config.policy()
+            self.digests.window = config.digest_window
+            for tenant in diff.removed:
+                del self._states[tenant.key]
+                self._tasks.pop(tenant.key).cancel()
+                await self._run_blocking(self.digests.flush, tenant.key)
+            if diff.removed and self.shard is not None:
+                await self._run_blocking(
+                    self.shard.release, [tenant.key for tenant in diff.removed]
+                )
+            for tenant in diff.changed:
+                self._states[tenant.key].tenant = tenant
+            for tenant in diff.added:
+                record = await self._run_blocking(
+                    self.store.load_tenant, tenant.key
+                )
+                state = TenantState(tenant, record, int(time.time()))
+                if self.shard is None:
+                    await self._run_blocking(self.delivery.resume, [tenant])
+                self._states[tenant.key] = state
+                self._tasks[tenant.key] = self._start(
+                    self._poll_forever(state)
+                )
+            logger.info(
+                'Configuration applied: %d tenants added, %d removed, '
+                '%d changed.',
+                len(diff.added), len(diff.removed), len(diff.changed)
+            )
+        self._check_finished()
+
+    def rebalance(self):
+        """Takes the tenants of this worker over and gives the others up.
+
+        The pending writes are committed before a lease is released, and
+        a tenant taken over is restored from the store, so the new owner
+        continues where the previous one stopped.
+        """
+        wanted = self.shard.assigned(list(self._states))
+        dropped = self.shard.owned - wanted
+        if dropped:
+            self.store.flush()
+            self.shard.release(dropped)
+        self.shard.claim(wanted, self._take_over)
+
+    def _take_over(self, tenant_key):
+        state = self._states.get(tenant_key)
+        if state is None:
+            return
+        logger.info('Taking the tenant %s over.', tenant_key)
+        state.restore(self.store.load_tenant(tenant_key), int(time.time()))
+        self.delivery.resume([state.tenant])
+
+    async def _rebalance_forever(self):
+        while not self._stopping.is_set():
+            await self._wait(self.shard.heartbeat_interval, asyncio.sleep)
+            if self._stopping.is_set():
+                return
+            try:
+                await self._run_rebalance()
+            except Exception as error:
+                ERRORS.inc(exception=type(error).__name__)
+                logger.error('Rebalancing failed: %s', error)
+
+    async def _reload_forever(self):
+        while not self._stopping.is_set():
+            await self._wait(CONFIG_POLL_INTERVAL, asyncio.sleep)
+            if not self._stopping.is_set() and self.reloader.changed():
+                await self.reload()
+
+    def _start(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            if self._failure is None:
+                self._failure = task.exception()
+            self._finished.set()
+        else:
+            self._check_finished()
+
+    def _check_finished(self):
+        # The removed tenants may all be gone before the added ones start.
+        if self._reconfiguring.locked():
+            return
+        if all(task.done() for task in self._tasks.values()):
+            self._finished.set()
+
+    async def _wait(self, delay, sleep=None):
+        """Sleeps for `delay` seconds or until the engine is stopped."""
+        if self._stopping.is_set():
+            return
+        sleeper = asyncio.ensure_future((sleep or self.sleep)(delay))
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        try:
+            await asyncio.wait(
+                (sleeper, stopping), return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            sleeper.cancel()
+            stopping.cancel()
+        if sleeper.done() and not sleeper.cancelled():
+            sleeper.result()
+
+    def _run_blocking(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, func, *args
+        )
+
+    def _run_rebalance(self):
+        return asyncio.get_running_loop().run_in_executor(
+            self._shard_executor, self.rebalance
+        )
+
+    async def _poll_forever(self, state):
+        # The loop of a removed tenant also ends by itself, as on Python
+        # 3.11 `wait_for` may lose the cancellation of a finishing cycle.
+        while (
+            not state.disabled and not self._stopping.is_set()
+            and self._states.get(state.tenant.key) is state
+        ):
+            if self.shard is not None and not self.shard.owns(
+                state.tenant.key
+            ):
+                await self._wait(self.shard.heartbeat_interval)
+                continue
+            cycle = self.poll_once
+            timeout = self.cycle_budget + CYCLE_GRACE
+            if state.needs_backfill and self.backfill_new:
+                cycle = self.backfill_once
+                timeout = None
+            async with self._semaphore:
+                try:
+                    await asyncio.wait_for(
+                        self.run_for_tenant(state.tenant, cycle, state),
+                        timeout,
+                    )
+                except asyncio.TimeoutError:
+                    TIMEOUTS.inc(call='cycle')
+                    logger.error(
+                        'Poll cycle of %s is abandoned after %s seconds.',
+                        state.tenant.chat_id, timeout
+                    )
+            await self._wait(self.policy.next_delay(state.last_status))
+
+    def run_for_tenant(self, tenant, func, *args):
+        """Runs a blocking function in the pool on behalf of a tenant.
+
+        Returns:
+            asyncio.Future: The future with the result of the function.
+        """
+        context = contextvars.copy_context()
+        context.run(current_tenant.set, tenant)
+        context.run(current_client.set, self.client)
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, context.run, func, *args
+        )
+
+    def poll_once(self, state):
+        """Makes a single poll cycle for a tenant.
+
+        Arguments:
+            state (TenantState): Polling state of the tenant.
+        """
+        POLLS.inc(tenant=state.tenant.key)
+        current_deadline.set(Deadline(self.cycle_budget))
+        with CYCLE_DURATION.time():
+            self._poll(state)
+
+    def _poll(self, state):
+        try:
+            response = homework.get_api_answer(state.timestamp)
+            if response is state.last_response:
+                logger.debug('The response did not change.')
+                return
+            self._handle(state, VALIDATOR.validate(response))
+            # Only a handled response is skipped, a failed one is retried.
+            state.last_response = response
+        except InvalidTokenException as error:
+            ERRORS.inc(exception=type(error).__name__)
+            logger.critical(
+                'Polling of the tenant %s is stopped: %s',
+                state.tenant.key, error
+            )
+            state.disabled = True
+            self.delivery.put(state.tenant, f'Program crash: {error}')
+        except CircuitOpenException as error:
+            ERRORS.inc(exception=type(error).__name__)
+            logger.debug('Poll skipped: %s', error)
+        except Exception as error:
+            ERRORS.inc(exception=type(error).__name__)
+            message = f'Program crash: {error}'
+            logger.error(message)
+            if message != state.last_message:
+                self.delivery.put(state.tenant, message)
+                state.last_message = message
+
+    def _handle(self, state, result):
+        for error in result.errors:
+            logger.error('Invalid homework skipped: %s', error)
+        homeworks = result.homeworks
+        for changed in state.index.changes(reversed(homeworks)):
+            self.digests.add(
+                state.tenant,
+                HomeworkIndex.key(changed),
+                homework.parse_status(changed),
+                partial(self._delivered, state, changed),
+                idempotency_key(changed),
+                state.timestamp,
+            )
+        if homeworks:
+            state.last_status = homeworks[0].status.value
+        # Without any homework the cursor stays, so the next request is
+        # the same and the response cache can revalidate it.
+        if result.current_date is not None and (homeworks or result.errors):
+            state.timestamp = result.current_date
+        self._save_cursor(state)
+
+    def _save_cursor(self, state):
+        """Persists the cursor, held back while the digest holds changes."""
+        held = self.digests.held_cursor(state.tenant.key)
+        self.store.save_cursor(
+            state.tenant.key, state.timestamp if held is None else held
+        )
+
+    def _digest_flushed(self, tenant):
+        state = self._states.get(tenant.key)
+        if state is not None:
+            self._save_cursor(state)
+
+    def backfill_once(self, state):
+        """Rebuilds the state of a new tenant without sending messages.
+
+        Arguments:
+            state (TenantState): Polling state of the tenant.
+        """
+        state.needs_backfill = False
+        try:
+            state.timestamp = backfill.backfill(
+                state.index, 0, partial(self._backfilled, state)
+            )
+        except Exception as error:
+            logger.error('Backfill failed, polling from now: %s', error)
+            return
+        state.guess_last_status()
+        self.store.save_cursor(state.tenant.key, state.timestamp)
+
+    def _backfilled(self, state, record, message):
+        self.store.save_status(
+            state.tenant.key,
+            HomeworkIndex.key(record),
+            HomeworkIndex.status(record),
+        )
+
+    def _delivered(self, state, changed):
+        state.index.update(changed)
+        self.store.save_status(
+            state.tenant.key,
+            HomeworkIndex.key(changed),
+            HomeworkIndex.status(changed),
+        )
+
+
+async def serve(engine, signals=SIGNALS):
+    """Runs the engine until one of the signals is received.
+
+    SIGHUP reloads the configuration of the engine.
+    """
+    loop = asyncio.get_running_loop()
+
+    def on_signal(signum):
+        SHUTDOWN.request(signum)
+        engine.stop()
+
+    for signum in signals:
+        loop.add_signal_handler(signum, on_signal, signum)
+    loop.add_signal_handler(signal.SIGHUP, engine.request_reload)
+    SHUTDOWN.watch()
+    try:
+        await engine.run()
+    finally:
+        for signum in (*signals, signal.SIGHUP):
+            loop.remove_signal_handler(signum)
+
+
+def main():
+    """Serves every tenant from a single worker process."""
+    try:
+        reloader = ConfigReloader()
+    except ConfigException as error:
+        raise SystemExit(f'Invalid configuration: {error}')
+    config = reloader.config
+    homework.configure_telegram()
+    bot = telebot.TeleBot(token=config.telegram_token)
+    if METRICS_PORT:
+        start_server(int(METRICS_PORT))
+    logger.info(
+        'Starting the polling engine for %d tenants.', len(config.tenants)
+    )
+    shard = ShardCoordinator() if SHARD_DB_PATH else None
+    asyncio.run(serve(PollingEngine(
+        config.tenants,
+        bot,
+        policy=config.policy(),
+        shard=shard,
+        digest_window=config.digest_window,
+        reloader=reloader,
+    )))
+
+
+if __name__ == '__main__':
+    setup_logging()
+    main()
@@ -8,3 +8,35 @@ class StatusCodeException(Exception):
 
 class SendTelegramException(Exception):
     """Exception raised because the message to user was not sent."""
+
+
+class CircuitOpenException(StatusCodeException):
+    """Exception raised if the API is skipped after repeated failures."""
+
+
+class InvalidTokenException(StatusCodeException):
+    """Exception raised if the API rejects the Practicum token."""
+
+
+class TimeoutException(StatusCodeException):
+    """Exception raised if the API request runs out of time."""
+
+
+class SendTimeoutException(SendTelegramException):
+    """Exception raised if the message is not sent in time."""
+
+
+class SchemaException(TypeError):
+    """Exception raised if the API response does not match the schema."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+class ConfigException(ValueError):
+    """Exception raised if the configuration is invalid."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
@@ -1,28 +1,45 @@
 import logging
 import time
-
-from dotenv import load_dotenv
 from http import HTTPStatus
-import requests
-from telebot import apihelper, TeleBot, types
 
 from constants import (
     ENDPOINT,
     HEADERS,
-    HOMEWORK_VERDICTS,
     PRACTICUM_TOKEN,
+    REMOVE_KEYBOARD,
     RETRY_PERIOD,
+    TELEGRAM_API_URL,
     TELEGRAM_CHAT_ID,
+    TELEGRAM_CONNECT_RETRIES,
+    TELEGRAM_POOL_MAXSIZE,
+    TELEGRAM_TIMEOUT,
     TELEGRAM_TOKEN,
 )
+# Re-exported for the upstream tests, which read `homework.HOMEWORK_VERDICTS`.
+from constants import HOMEWORK_VERDICTS  # noqa: F401
+from deadline import clip, get_timeout
 from exceptions import (
+    InvalidTokenException,
     SendTelegramException,
+    SendTimeoutException,
     StatusCodeException,
-    UndefinedStatusException
+    TimeoutException,
+    UndefinedStatusException,
 )
+from http_client import PooledClient, current_client
+from lazy import lazy_import
+from log_config import setup_logging
+from messages import MESSAGES
+from metrics import API_LATENCY, SEND_LATENCY, TIMEOUTS
+from schema import Homework
+from shutdown import SHUTDOWN
+from state import HomeworkIndex
+from tenants import current_tenant
 
 
-load_dotenv()
+# Loaded on the first use, so importing this module stays cheap.
+requests = lazy_import('requests')
+telebot = lazy_import('telebot')
 logger = logging.getLogger(__name__)
 
 
@@ -41,12 +58,52 @@ def check_tokens():
     ]
     if missing_tokens:
         logger.critical(
-            f'Check for existence of environment varibles/tokens:'
-            f'{", ".join(missing_tokens)}'
+            'Check for existence of environment varibles/tokens:%s',
+            ', '.join(missing_tokens)
         )
     return missing_tokens
 
 
+def configure_telegram():
+    """Prepares the Telegram client of the process.
+
+    The requests are sent over a single pool of keep-alive connections
+    shared by every thread, to `TELEGRAM_API_URL` when it is set.
+    """
+    if TELEGRAM_API_URL:
+        telebot.apihelper.API_URL = TELEGRAM_API_URL
+    if telebot.apihelper.CUSTOM_REQUEST_SENDER is None:
+        telebot.apihelper.CUSTOM_REQUEST_SENDER = PooledClient(
+            pool_maxsize=TELEGRAM_POOL_MAXSIZE,
+            circuit_breaker=False,
+            connect_retries=TELEGRAM_CONNECT_RETRIES,
+        ).request
+
+
+def get_chat_id():
+    """Returns the Telegram chat ID of the tenant being served."""
+    tenant = current_tenant.get()
+    if tenant is None:
+        return TELEGRAM_CHAT_ID
+    return tenant.chat_id
+
+
+def get_locale():
+    """Returns the message locale of the tenant being served."""
+    tenant = current_tenant.get()
+    if tenant is None:
+        return None
+    return tenant.locale
+
+
+def get_headers():
+    """Returns the Practicum API headers of the tenant being served."""
+    tenant = current_tenant.get()
+    if tenant is None:
+        return HEADERS
+    return {'Authorization': f'OAuth {tenant.practicum_token}'}
+
+
 def send_message(bot, message):
     """Function that sends a message to the user through a bot.
 
@@ -55,52 +112,102 @@ def send_message(bot, message):
         message (str):  Message to be sent to the user.
     """
     logger.info('Loading the message to send it to telegram user.')
+    chat_id = get_chat_id()
     try:
-        bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
-            text=message,
-            reply_markup=types.ReplyKeyboardRemove()
-        )
-        logger.debug(
-            f'Message succesfully sent to {TELEGRAM_CHAT_ID}: {message}'
-        )
-    except (requests.RequestException, apihelper.ApiException) as error:
+        with SEND_LATENCY.time():
+            bot.send_message(
+                chat_id=chat_id,
+                text=message,
+                reply_markup=REMOVE_KEYBOARD,
+                timeout=clip(TELEGRAM_TIMEOUT)
+            )
+        logger.debug('Message succesfully sent to %s: %s', chat_id, message)
+    except requests.Timeout as error:
+        TIMEOUTS.inc(call='telegram')
+        message = f'Timed out sending the message: {error}'
+        logger.error(message)
+        raise SendTimeoutException(message) from error
+    except (
+        requests.RequestException, telebot.apihelper.ApiException
+    ) as error:
         message = f'Failed to send message: {error}'
         logger.error(message)
-        raise SendTelegramException(message)
+        raise SendTelegramException(message) from error
 
 
-def get_api_answer(timestamp):
-    """Function that gets a request to the Yandex Practicum API.
+def redact(request_kwargs):
+    """Returns the request parameters safe to be logged.
+
+    The headers carry the Practicum token, so they are left out.
+    """
+    return {
+        name: value for name, value in request_kwargs.items()
+        if name != 'headers'
+    }
+
+
+def get_api_response(timestamp, stream=False):
+    """Function that makes a request to the Yandex Practicum API.
 
     Arguments:
         timestamp (int): A timestamp representing the actual time.
+        stream (bool): Whether to leave the response body unread.
 
     Raises:
         StatusCodeException: Exception if HTTP request code status is not 200.
+        InvalidTokenException: Exception if the token is rejected.
 
     Returns:
-        dict: API response converted to Python data type.
+        requests.Response: API response with the 200 status code.
     """
     logger.info('Making the request to the Yandex Practicum API.')
     request_kwargs = {
         'url': ENDPOINT,
-        'headers': HEADERS,
+        'headers': get_headers(),
         'params': {'from_date': timestamp}
     }
+    if stream:
+        request_kwargs['stream'] = True
+    client = current_client.get()
+    get = requests.get if client is None else client.get
     try:
-        response = requests.get(**request_kwargs)
+        request_kwargs['timeout'] = get_timeout()
+        with API_LATENCY.time():
+            response = get(**request_kwargs)
+    except requests.Timeout as error:
+        TIMEOUTS.inc(call='practicum')
+        raise TimeoutException(f'API request timed out: {error}.')
     except requests.RequestException as error:
         raise StatusCodeException(
             f'API failed to make a request: {error}.\n'
-            f'Request parameters: {request_kwargs}'
+            f'Request parameters: {redact(request_kwargs)}'
+        )
+    if response.status_code == HTTPStatus.UNAUTHORIZED:
+        raise InvalidTokenException(
+            'Practicum token is rejected.\n'
+            f'Request parameters: {redact(request_kwargs)}'
         )
     if response.status_code != HTTPStatus.OK:
         raise StatusCodeException(
             'Not 200 Http status code.\n'
-            f'Request parameters: {request_kwargs}'
+            f'Request parameters: {redact(request_kwargs)}'
         )
-    return response.json()
+    return response
+
+
+def get_api_answer(timestamp):
+    """Function that gets a request to the Yandex Practicum API.
+
+    Arguments:
+        timestamp (int): A timestamp representing the actual time.
+
+    Raises:
+        StatusCodeException: Exception if HTTP request code status is not 200.
+
+    Returns:
+        dict: API response converted to Python data type.
+    """
+    return get_api_response(timestamp).json()
 
 
 def check_response(response):
@@ -133,7 +240,8 @@ def parse_status(homework):
     """Parse the status of a homework and returns a message with the status.
 
     Arguments:
-        homework (dict): Dictionary with the information of the homework.
+        homework (dict): Dictionary with the information of the homework
+            or an already validated `schema.Homework` record.
 
     Raises:
         TypeError: Exception for non correct type.
@@ -143,21 +251,26 @@ def parse_status(homework):
     Returns:
         str: Message with the status of the homework.
     """
+    if isinstance(homework, Homework):
+        return MESSAGES.render(
+            homework.name,
+            homework.status.value,
+            get_locale(),
+            lesson_name=homework.lesson_name,
+            reviewer_comment=homework.reviewer_comment,
+        )
     if not isinstance(homework, dict):
         raise TypeError('Homework must be a dictionary type.')
     if 'homework_name' not in homework:
         raise KeyError('No "homework_name" at homework keys.')
     if 'status' not in homework:
         raise KeyError('No "status" at homework keys.')
-    homework_name = homework['homework_name']
-    homework_status = homework['status']
-    if homework_status not in HOMEWORK_VERDICTS:
-        raise UndefinedStatusException(
-            f'Unkown status: {homework_status}'
-        )
-    return (
-        f'Изменился статус проверки работы "{homework_name}".'
-        f'{HOMEWORK_VERDICTS[homework_status]}'
+    return MESSAGES.render(
+        homework['homework_name'],
+        homework['status'],
+        get_locale(),
+        lesson_name=homework.get('lesson_name'),
+        reviewer_comment=homework.get('reviewer_comment'),
     )
 
 
@@ -168,22 +281,31 @@ def main():
             f'Check for existence of environment varibles/tokens:'
             f'{", ".join(missing_tokens)}'
         )
-    bot = TeleBot(token=TELEGRAM_TOKEN)
+    configure_telegram()
+    bot = telebot.TeleBot(token=TELEGRAM_TOKEN)
     timestamp = int(time.time())
     last_message = ''
+    index = HomeworkIndex()
 
-    while True:
+    while not SHUTDOWN.is_set():
         try:
             response = get_api_answer(timestamp)
-            timestamp = response.get('current_date', timestamp)
             homeworks = check_response(response)
-            if homeworks:
-                new_message = parse_status(homeworks[0])
-                if new_message != last_message:
-                    send_message(bot, new_message)
-                    last_message = new_message
+            for homework in index.changes(reversed(homeworks or ())):
+                try:
+                    message = parse_status(homework)
+                except (
+                    TypeError, KeyError, UndefinedStatusException
+                ) as error:
+                    logging.error('Invalid homework skipped: %s', error)
+                    continue
+                send_message(bot, message)
+                index.update(homework)
+            # Moved past the changes unless one of them is not delivered,
+            # the undelivered ones are fetched and sent again next time.
+            timestamp = response.get('current_date', timestamp)
         except SendTelegramException as error:
-            logging.error(f'Error sending the message: {error}')
+            logging.error('Error sending the message: %s', error)
         except Exception as error:
             message = f'Program crash: {error}'
             logging.error(message)
@@ -191,15 +313,11 @@ def main():
                 send_message(bot, message)
                 last_message = message
         finally:
-            time.sleep(RETRY_PERIOD)
+            with SHUTDOWN.interruptible():
+                time.sleep(RETRY_PERIOD)
 
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.DEBUG,
-        filename='program.log',
-        format='%(asctime)s, %(levelname)s, %(message)s, %(name)s',
-    )
-    handler = logging.StreamHandler()
-    logger.addHandler(handler)
+    setup_logging()
+    SHUTDOWN.install()
     main()
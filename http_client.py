@@ -0,0 +1,176 @@
+import threading
+import time
+from contextvars import ContextVar
+from http import HTTPStatus
+from typing import NamedTuple
+
+from breaker import get_breaker
+from constants import (
+    HTTP_IDLE_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+)
+from deadline import get_timeout
+from lazy import lazy_import
+
+
+requests = lazy_import('requests')
+current_client = ContextVar('current_client', default=None)
+
+
+class ClientStats(NamedTuple):
+    """Connection usage statistics of a PooledClient."""
+
+    requests: int
+    connections: int
+
+    @property
+    def reused(self):
+        """Number of requests sent over an already open connection."""
+        return self.requests - self.connections
+
+
+class PooledClient:
+    """HTTP client keeping alive a pool of connections to the API hosts.
+
+    Arguments:
+        pool_connections (int): Number of hosts to keep the pools for.
+        pool_maxsize (int): Maximum number of connections per host.
+        idle_timeout (float): Seconds after which the idle connections
+            are closed. None keeps them open forever.
+        clock (callable): Returns the current monotonic time.
+        cache (cache.ResponseCache): Cache of the responses or None.
+        circuit_breaker (bool): Whether to stop the requests to a host
+            failing repeatedly, with a breaker shared by every client.
+        retry (retry.RetryPolicy): Repeats the requests failed for a
+            transient reason, or None.
+        connect_retries (int): Attempts to open a connection again,
+            before any data reaches the server.
+    """
+
+    def __init__(
+        self,
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        idle_timeout=HTTP_IDLE_TIMEOUT,
+        clock=time.monotonic,
+        cache=None,
+        circuit_breaker=True,
+        retry=None,
+        connect_retries=0,
+    ):
+        self.idle_timeout = idle_timeout
+        self.cache = cache
+        self.circuit_breaker = circuit_breaker
+        self.retry = retry
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_used = clock()
+        self._evicted_requests = 0
+        self._evicted_connections = 0
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=connect_retries,
+        )
+        self._adapter.poolmanager.pools.dispose_func = self._dispose
+        self._session = requests.Session()
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+
+    def get(self, url, **kwargs):
+        """Sends a GET request reusing a pooled connection when possible.
+
+        Raises:
+            CircuitOpenException: Exception if the host is failing.
+
+        Returns:
+            requests.Response: The response of the server, or a
+                cache.CachedResponse when the client has a cache.
+        """
+        self.evict_idle()
+        if self.retry is None:
+            return self._guarded_send(url, **kwargs)
+        return self.retry.call(lambda: self._guarded_send(url, **kwargs))
+
+    def request(self, method, url, **kwargs):
+        """Sends a request of any method over the pooled connections.
+
+        Neither the cache nor the retry policy apply, so the signature
+        fits `telebot.apihelper.CUSTOM_REQUEST_SENDER`.
+
+        Returns:
+            requests.Response: The response of the server.
+        """
+        self.evict_idle()
+        timeout = kwargs.get('timeout')
+        if timeout is not None:
+            if not isinstance(timeout, tuple):
+                timeout = (timeout, timeout)
+            kwargs['timeout'] = get_timeout(*timeout)
+        return self._session.request(method, url, **kwargs)
+
+    def _guarded_send(self, url, **kwargs):
+        # An expired deadline raises before the breaker sees the request,
+        # it says nothing about the health of the host.
+        if 'timeout' in kwargs:
+            kwargs['timeout'] = get_timeout(*kwargs['timeout'])
+        if not self.circuit_breaker:
+            return self._send(url, **kwargs)
+        breaker = get_breaker(url)
+        breaker.before_request()
+        try:
+            response = self._send(url, **kwargs)
+        except Exception:
+            breaker.record_failure()
+            raise
+        if (
+            response.status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+            or response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        ):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def _send(self, url, **kwargs):
+        if self.cache is None or kwargs.get('stream'):
+            return self._session.get(url, **kwargs)
+        return self.cache.fetch(self._session.get, url, **kwargs)
+
+    def evict_idle(self):
+        """Closes every pooled connection if the client was idle too long."""
+        with self._lock:
+            now = self._clock()
+            idle = now - self._last_used
+            self._last_used = now
+        if self.idle_timeout is not None and idle > self.idle_timeout:
+            self._adapter.poolmanager.clear()
+
+    def stats(self):
+        """Returns the connection usage statistics.
+
+        Returns:
+            ClientStats: Sent requests and opened connections.
+        """
+        pools = list(self._adapter.poolmanager.pools._container.values())
+        with self._lock:
+            return ClientStats(
+                requests=self._evicted_requests + sum(
+                    pool.num_requests for pool in pools
+                ),
+                connections=self._evicted_connections + sum(
+                    pool.num_connections for pool in pools
+                ),
+            )
+
+    def close(self):
+        """Closes the session and every pooled connection."""
+        self._session.close()
+
+    def _dispose(self, pool):
+        with self._lock:
+            self._evicted_requests += pool.num_requests
+            self._evicted_connections += pool.num_connections
+        pool.close()
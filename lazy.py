@@ -0,0 +1,32 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Returns a module which is only executed on its first use.
+
+    The module is registered in `sys.modules`, so the later imports of
+    it, lazy or not, share the same object. An already imported module
+    is returned as is.
+
+    Arguments:
+        name (str): Absolute name of a top-level module.
+
+    Raises:
+        ModuleNotFoundError: Exception if the module is not installed.
+
+    Returns:
+        module: The module, loaded by the first access to an attribute.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,254 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from constants import (
+    LOG_BACKUP_COUNT,
+    LOG_DEDUP_MAX_FINGERPRINTS,
+    LOG_DEDUP_WINDOW,
+    LOG_FILE,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_QUEUE_SIZE,
+    LOG_ROTATE_INTERVAL,
+)
+from metrics import LOG_RECORDS_DROPPED
+from tenants import current_tenant
+
+
+CONSOLE_FORMAT = '%(asctime)s, %(levelname)s, %(message)s, %(name)s'
+RECORD_FIELDS = ('tenant', 'chat_id')
+VARIABLE_PARTS = re.compile(r"'[^']*'|\"[^\"]*\"|0x[0-9a-f]+|\d+", re.I)
+
+
+class TenantFilter(logging.Filter):
+    """Adds the fields of the current tenant to the records.
+
+    Has to run in the thread emitting the record, since the tenant is
+    kept in a context variable.
+    """
+
+    def filter(self, record):
+        """Sets the `tenant` and `chat_id` attributes of a record."""
+        tenant = current_tenant.get()
+        record.tenant = None if tenant is None else tenant.key
+        record.chat_id = None if tenant is None else tenant.chat_id
+        return True
+
+
+def fingerprint(record):
+    """Returns the key of the records repeating the same failure.
+
+    The key is made of the logger, the level, the exception class and
+    the message with the quoted strings and the numbers masked.
+    """
+    exception = record.exc_info[0].__name__ if record.exc_info else None
+    message = VARIABLE_PARTS.sub('#', record.getMessage())
+    return record.name, record.levelno, exception, message
+
+
+class DeduplicatingFilter(logging.Filter):
+    """Lets a repeated warning or error through once per window.
+
+    The first record with a fingerprint passes, the next ones are counted
+    and dropped until the window is over. The first record after that
+    passes with the number of the dropped ones appended to its message.
+
+    Arguments:
+        window (float): Seconds between two records with a fingerprint.
+        max_fingerprints (int): Fingerprints remembered at the same time.
+        level (int): Records below the level always pass.
+        clock (callable): Returns the current monotonic time.
+    """
+
+    def __init__(
+        self,
+        window=LOG_DEDUP_WINDOW,
+        max_fingerprints=LOG_DEDUP_MAX_FINGERPRINTS,
+        level=logging.WARNING,
+        clock=time.monotonic,
+    ):
+        super().__init__()
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self.level = level
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()
+
+    def filter(self, record):
+        """Tells whether a record has to be emitted."""
+        if record.levelno < self.level or not self.window:
+            return True
+        key = fingerprint(record)
+        now = self._clock()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                return False
+            self._seen[key] = [now, 0]
+            self._seen.move_to_end(key)
+            if len(self._seen) > self.max_fingerprints:
+                self._seen.popitem(last=False)
+        if entry is not None and entry[1]:
+            record.msg = (
+                f'{record.getMessage()} (repeated {entry[1]} times in '
+                f'{now - entry[0]:.0f} seconds)'
+            )
+            record.args = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Renders a record as a single line JSON object."""
+
+    def format(self, record):
+        """Returns the JSON representation of a record."""
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SafeQueueListener(QueueListener):
+    """Queue listener which may be stopped more than once."""
+
+    def stop(self):
+        """Writes out the queued records and stops the thread."""
+        if self._thread is not None:
+            super().stop()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Puts the records into a bounded queue, dropping them when it is full.
+
+    The emitting thread never waits for the log I/O, the dropped records
+    are counted in the `LOG_RECORDS_DROPPED` metric.
+    """
+
+    def enqueue(self, record):
+        """Puts a record into the queue without blocking."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """Rotates the log file by size and by age, compressing the backups.
+
+    Arguments:
+        filename (str): Path to the log file.
+        max_bytes (int): Size of the file to rotate at, 0 disables it.
+        backup_count (int): Number of the compressed backups to be kept.
+        interval (float): Seconds between two rotations, 0 disables it.
+        clock (callable): Returns the current time.
+    """
+
+    def __init__(
+        self,
+        filename,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        interval=LOG_ROTATE_INTERVAL,
+        clock=time.time,
+    ):
+        super().__init__(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding='utf-8',
+            delay=True,
+        )
+        self.interval = interval
+        self._clock = clock
+        self.rollover_at = clock() + interval
+
+    def namer(self, name):
+        """Returns the name of a compressed backup."""
+        return name + '.gz'
+
+    def rotator(self, source, dest):
+        """Compresses the rotated file into the backup."""
+        with open(source, 'rb') as plain, gzip.open(dest, 'wb') as packed:
+            shutil.copyfileobj(plain, packed)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        """Tells whether the file is too large or too old."""
+        if self.interval and self._clock() >= self.rollover_at:
+            return os.path.exists(self.baseFilename)
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        """Rotates the file and schedules the next rotation by age."""
+        super().doRollover()
+        self.rollover_at = self._clock() + self.interval
+
+
+def setup_logging(
+    filename=LOG_FILE,
+    level=LOG_LEVEL,
+    console=True,
+    queue_size=LOG_QUEUE_SIZE,
+    dedup_window=LOG_DEDUP_WINDOW,
+):
+    """Sends the records of the root logger through a background thread.
+
+    The repeated warnings and errors are sampled by the
+    `DeduplicatingFilter`, the other records get the tenant fields and go
+    to a bounded queue. The listener thread writes them as JSON lines to
+    a rotated file and as plain text to the console.
+
+    Arguments:
+        filename (str): Path to the log file.
+        level (str): Level of the root logger.
+        console (bool): Whether to also write the records to stderr.
+        queue_size (int): Records kept in memory before dropping them.
+        dedup_window (float): Seconds a repeated error is muted for,
+            0 disables the sampling.
+
+    Returns:
+        SafeQueueListener: The started listener.
+    """
+    file_handler = CompressingRotatingFileHandler(filename)
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+    records = queue.Queue(queue_size)
+    queue_handler = DroppingQueueHandler(records)
+    queue_handler.addFilter(DeduplicatingFilter(dedup_window))
+    queue_handler.addFilter(TenantFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener = SafeQueueListener(
+        records, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,105 @@
+from constants import DEFAULT_LOCALE, HOMEWORK_VERDICTS
+from exceptions import UndefinedStatusException
+
+
+CATALOG = {
+    'ru': {
+        'template': (
+            'Изменился статус проверки работы "{homework_name}".'
+            '{lesson}{comment}{verdict}'
+        ),
+        'lesson': ' Урок «{lesson_name}».\n',
+        'comment': 'Комментарий ревьюера: {reviewer_comment}\n',
+        'verdicts': HOMEWORK_VERDICTS,
+    },
+    'en': {
+        'template': (
+            'The review status of "{homework_name}"{lesson} has changed. '
+            '{verdict}{comment}'
+        ),
+        'lesson': ' ({lesson_name})',
+        'comment': '\nReviewer comment: {reviewer_comment}',
+        'verdicts': {
+            'approved': 'The reviewer liked it. Hooray!',
+            'reviewing': 'The reviewer has started the review.',
+            'rejected': 'The reviewer has left some remarks.',
+        },
+    },
+}
+
+
+def escape(text):
+    """Makes a text a literal part of a format string."""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+class MessageCatalog:
+    """Renders the status messages in the locales of a catalog.
+
+    The template of every (locale, status) pair is compiled once with
+    its verdict, so rendering a message is a lookup and a `str.format`.
+    An optional fragment of a locale, like `comment`, is only rendered
+    when its field is set in the homework.
+
+    Arguments:
+        catalog (dict): Templates, optional fragments and verdicts by
+            the locales.
+        default_locale (str): Locale used for the unknown ones.
+    """
+
+    def __init__(self, catalog=CATALOG, default_locale=DEFAULT_LOCALE):
+        self.default_locale = default_locale
+        self._templates = {}
+        self._fragments = {}
+        for locale, entry in catalog.items():
+            self._fragments[locale] = {
+                'lesson': ('lesson_name', entry['lesson']),
+                'comment': ('reviewer_comment', entry['comment']),
+            }
+            for status, verdict in entry['verdicts'].items():
+                self._templates[locale, status] = entry['template'].format(
+                    homework_name='{homework_name}',
+                    lesson='{lesson}',
+                    comment='{comment}',
+                    verdict=escape(verdict),
+                )
+        if default_locale not in self._fragments:
+            raise ValueError(f'No messages for the locale {default_locale}.')
+
+    @property
+    def locales(self):
+        """Returns the locales of the catalog."""
+        return tuple(self._fragments)
+
+    def render(self, homework_name, status, locale=None, **fields):
+        """Returns the message about a changed homework status.
+
+        Arguments:
+            homework_name (str): Name of the homework.
+            status (str): New status of the homework.
+            locale (str): Locale of the message, the default one if None
+                or unknown.
+            fields: Values of the optional fragments, like `lesson_name`
+                and `reviewer_comment`.
+
+        Raises:
+            UndefinedStatusException: Exception for an unknown status.
+
+        Returns:
+            str: Message with the status of the homework.
+        """
+        if locale not in self._fragments:
+            locale = self.default_locale
+        template = self._templates.get((locale, status))
+        if template is None:
+            raise UndefinedStatusException(f'Unkown status: {status}')
+        optional = {}
+        for name, (field, fragment) in self._fragments[locale].items():
+            value = fields.get(field)
+            optional[name] = fragment.format_map({field: value}) if (
+                fragment and value
+            ) else ''
+        return template.format(homework_name=homework_name, **optional)
+
+
+MESSAGES = MessageCatalog()
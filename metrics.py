@@ -0,0 +1,284 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http import HTTPStatus
+
+from constants import METRICS_HOST
+
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(labels):
+    """Renders the labels in the Prometheus text format."""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def format_value(value):
+    """Renders a sample value in the Prometheus text format."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base of the metrics holding a sample per set of label values.
+
+    Arguments:
+        name (str): Metric name.
+        documentation (str): Help text of the metric.
+        labelnames (tuple): Names of the labels.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'Metric {self.name} expects labels {self.labelnames}.'
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        """Returns the lines of the metric in the Prometheus text format."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self._lock:
+            samples = list(self._samples.items())
+        for key, sample in samples:
+            lines.extend(self._render_sample(
+                tuple(zip(self.labelnames, key)), sample
+            ))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f'{self.name}{format_labels(labels)} {format_value(value)}']
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Increases the counter for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Returns the current value for the given label values."""
+        return self._samples.get(self._key(labels), 0)
+
+    def total(self):
+        """Returns the sum of the values for every label value."""
+        with self._lock:
+            return sum(self._samples.values())
+
+
+class Gauge(Metric):
+    """Value which goes up and down, optionally read from a callable."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        """Sets the gauge for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = value
+
+    def set_function(self, function):
+        """Reads the value of an unlabelled gauge from `function`."""
+        self._function = function
+
+    def render(self):
+        """Returns the lines of the metric in the Prometheus text format."""
+        if self._function is not None:
+            self.set(self._function())
+        return super().render()
+
+
+class Histogram(Metric):
+    """Distribution of the observed values over the buckets.
+
+    Arguments:
+        buckets (tuple): Sorted upper bounds of the buckets.
+    """
+
+    kind = 'histogram'
+
+    def __init__(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        """Records an observed value for the given label values."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = self._samples[key] = [[0] * len(self.buckets), 0]
+            sample[0][index] += 1
+            sample[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds spent in the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        """Returns the number of the observed values."""
+        sample = self._samples.get(self._key(labels))
+        return sum(sample[0]) if sample else 0
+
+    def _render_sample(self, labels, sample):
+        counts, total = sample
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            bucket_labels = labels + (('le', format_value(bound)),)
+            lines.append(
+                f'{self.name}_bucket{format_labels(bucket_labels)} '
+                f'{cumulative}'
+            )
+        lines.append(f'{self.name}_sum{format_labels(labels)} {total}')
+        lines.append(f'{self.name}_count{format_labels(labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Collection of the metrics exposed together."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Adds a metric to the registry and returns it."""
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered.')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Returns every metric in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+API_LATENCY = REGISTRY.register(Histogram(
+    'homework_api_request_seconds',
+    'Latency of the requests to the Practicum API.',
+))
+SEND_LATENCY = REGISTRY.register(Histogram(
+    'homework_send_message_seconds',
+    'Latency of the messages sent to Telegram.',
+))
+CYCLE_DURATION = REGISTRY.register(Histogram(
+    'homework_poll_cycle_seconds',
+    'Duration of a whole poll cycle of a tenant.',
+))
+ERRORS = REGISTRY.register(Counter(
+    'homework_errors_total',
+    'Errors by the exception type.',
+    ('exception',),
+))
+TIMEOUTS = REGISTRY.register(Counter(
+    'homework_timeouts_total',
+    'Timed out network calls and cycles.',
+    ('call',),
+))
+POLLS = REGISTRY.register(Counter(
+    'homework_polls_total',
+    'Poll cycles by the tenant.',
+    ('tenant',),
+))
+CIRCUIT_STATE = REGISTRY.register(Gauge(
+    'homework_circuit_state',
+    'Circuit breaker state: 0 closed, 1 half-open, 2 open.',
+    ('endpoint',),
+))
+LOG_RECORDS_DROPPED = REGISTRY.register(Counter(
+    'homework_log_records_dropped_total',
+    'Log records dropped because the log queue was full.',
+))
+DEAD_LETTERS = REGISTRY.register(Counter(
+    'homework_dead_letters_total',
+    'Messages given up after the last delivery attempt.',
+))
+CONFIG_RELOADS = REGISTRY.register(Counter(
+    'homework_config_reloads_total',
+    'Configuration reloads by the result.',
+    ('result',),
+))
+DELIVERY_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'homework_delivery_queue_depth',
+    'Messages waiting for a delivery worker.',
+))
+
+
+def start_server(port, host=METRICS_HOST, registry=REGISTRY):
+    """Serves the metrics over HTTP from a daemon thread.
+
+    Arguments:
+        port (int): Port to listen on, 0 picks a free one.
+        host (str): Address to listen on.
+        registry (Registry): Metrics to be served.
+
+    Returns:
+        http.server.ThreadingHTTPServer: The running server.
+    """
+    # Only the workers exposing the metrics pay for importing the server.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    return server
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+from constants import OUTBOX_RETENTION, STATE_DB_PATH
+from schema import Homework
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    tenant_key TEXT NOT NULL,
+    idempotency_key TEXT,
+    text TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    delivered_at REAL,
+    dead_at REAL,
+    last_error TEXT,
+    UNIQUE (tenant_key, idempotency_key)
+);
+CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (tenant_key)
+    WHERE delivered_at IS NULL AND dead_at IS NULL;
+'''
+NEW = 'new'
+PENDING = 'pending'
+DELIVERED = 'delivered'
+DEAD = 'dead'
+
+
+class OutboxMessage(NamedTuple):
+    """A message of the outbox waiting for delivery."""
+
+    id: int
+    tenant_key: str
+    text: str
+    attempts: int
+
+
+def idempotency_key(homework):
+    """Returns the key of the notification about a homework status.
+
+    The update date is a part of the key, so a homework coming back to
+    a status it already had is notified again.
+    """
+    if isinstance(homework, Homework):
+        date_updated = homework.date_updated
+        return (
+            f'{homework.key}:{homework.status.value}:'
+            f'{date_updated.isoformat() if date_updated else ""}'
+        )
+    return (
+        f'{homework.get("id", homework.get("homework_name"))}:'
+        f'{homework.get("status")}:{homework.get("date_updated", "")}'
+    )
+
+
+class Outbox:
+    """Durable log of the notifications to be sent to Telegram.
+
+    A notification is committed before it is handed to the delivery
+    workers, so it survives a failed delivery and a restart. A
+    notification with an idempotency key is stored only once per tenant.
+
+    Arguments:
+        path (str): Path to the SQLite database file.
+        retention (float): Seconds the delivered and dead messages are
+            kept for.
+        clock (callable): Returns the current time.
+    """
+
+    def __init__(
+        self, path=STATE_DB_PATH, retention=OUTBOX_RETENTION, clock=time.time
+    ):
+        self.retention = retention
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+
+    def add(self, tenant_key, text, key=None):
+        """Stores a notification unless it is already stored.
+
+        Arguments:
+            tenant_key (str): Key of the tenant to notify.
+            text (str): Message to be sent.
+            key (str): Idempotency key of the notification or None.
+
+        Returns:
+            tuple: ID of the message and NEW for a stored one, or the
+                PENDING, DELIVERED or DEAD state of an already stored one.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'INSERT OR IGNORE INTO outbox '
+                '(tenant_key, idempotency_key, text, created_at) '
+                'VALUES (?, ?, ?, ?)',
+                (tenant_key, key, text, self._clock())
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid, NEW
+            message_id, delivered_at, dead_at = self._connection.execute(
+                'SELECT id, delivered_at, dead_at FROM outbox '
+                'WHERE tenant_key = ? AND idempotency_key = ?',
+                (tenant_key, key)
+            ).fetchone()
+        if delivered_at is not None:
+            return message_id, DELIVERED
+        return message_id, PENDING if dead_at is None else DEAD
+
+    def pending(self, tenant_keys):
+        """Returns the undelivered messages of the tenants, oldest first."""
+        tenant_keys = set(tenant_keys)
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, tenant_key, text, attempts FROM outbox '
+                'WHERE delivered_at IS NULL AND dead_at IS NULL ORDER BY id'
+            ).fetchall()
+        return [
+            OutboxMessage(*row) for row in rows if row[1] in tenant_keys
+        ]
+
+    def mark_delivered(self, message_id):
+        """Records the delivery time of a message."""
+        self._update(
+            'UPDATE outbox SET delivered_at = ?, attempts = attempts + 1 '
+            'WHERE id = ?',
+            (self._clock(), message_id)
+        )
+
+    def mark_failed(self, message_id, error):
+        """Records a failed attempt to deliver a message."""
+        self._update(
+            'UPDATE outbox SET attempts = attempts + 1, last_error = ? '
+            'WHERE id = ?',
+            (str(error), message_id)
+        )
+
+    def mark_dead(self, message_id, error):
+        """Moves a message to the dead letters after its last attempt."""
+        self._update(
+            'UPDATE outbox SET dead_at = ?, attempts = attempts + 1, '
+            'last_error = ? WHERE id = ?',
+            (self._clock(), str(error), message_id)
+        )
+
+    def dead_letters(self):
+        """Returns the messages which were given up on."""
+        with self._lock:
+            return [
+                OutboxMessage(*row) for row in self._connection.execute(
+                    'SELECT id, tenant_key, text, attempts FROM outbox '
+                    'WHERE dead_at IS NOT NULL ORDER BY id'
+                )
+            ]
+
+    def purge(self):
+        """Deletes the messages finished more than `retention` ago."""
+        threshold = self._clock() - self.retention
+        self._update(
+            'DELETE FROM outbox WHERE delivered_at < ? OR dead_at < ?',
+            (threshold, threshold)
+        )
+
+    def close(self):
+        """Closes the database."""
+        self._connection.close()
+
+    def _update(self, query, parameters):
+        with self._lock, self._connection:
+            self._connection.execute(query, parameters)
@@ -0,0 +1,142 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+
+from constants import (
+    RETRY_BASE_DELAY,
+    RETRY_BUDGET,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+)
+from deadline import sleep, time_left
+from lazy import lazy_import
+
+
+requests = lazy_import('requests')
+
+
+def transient_errors():
+    """Returns the request exceptions worth another attempt."""
+    return (
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    )
+
+
+def is_transient(status_code):
+    """Whether a response status code is worth another attempt."""
+    return (
+        status_code == HTTPStatus.TOO_MANY_REQUESTS
+        or status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+    )
+
+
+def parse_retry_after(value, now=None):
+    """Returns the seconds from a `Retry-After` header value or None.
+
+    Arguments:
+        value (str): Delay in seconds or an HTTP date.
+        now (float): Current UNIX time for the HTTP dates.
+    """
+    if not value:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, date.timestamp() - (now or time.time()))
+
+
+class RetryPolicy:
+    """Repeats the requests failed for a transient reason.
+
+    The connection errors, timeouts, 429 and 5xx responses are repeated
+    after an exponential backoff with full jitter, or after the delay
+    from `Retry-After`, while the attempts and the time budget last.
+    Any other response is returned at once.
+
+    Arguments:
+        max_attempts (int): Maximum attempts of a request.
+        base_delay (float): Backoff ceiling of the first repetition.
+        max_delay (float): Maximum backoff ceiling.
+        budget (float): Seconds all the attempts of a request may take,
+            limited by the deadline of the current cycle.
+        rng (random.Random): Source of the jitter.
+        sleep (callable): Used to wait between the attempts, the wait
+            ends early if the shutdown starts.
+        clock (callable): Returns the current monotonic time.
+    """
+
+    def __init__(
+        self,
+        max_attempts=RETRY_MAX_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        budget=RETRY_BUDGET,
+        rng=None,
+        sleep=sleep,
+        clock=time.monotonic,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+        self._clock = clock
+
+    def backoff(self, attempt):
+        """Returns the jittered delay after a failed attempt number."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return self.rng.uniform(0, ceiling)
+
+    def call(self, send):
+        """Sends a request until it succeeds or the retries are exhausted.
+
+        Arguments:
+            send (callable): Sends the request and returns the response.
+
+        Returns:
+            requests.Response: The last response.
+        """
+        budget = self.budget
+        remaining = time_left()
+        if remaining is not None:
+            budget = min(budget, remaining)
+        deadline = self._clock() + budget
+        attempt = 1
+        while True:
+            try:
+                response = send()
+            except transient_errors():
+                if not self._wait(attempt, None, deadline):
+                    raise
+            else:
+                if not is_transient(response.status_code) or not self._wait(
+                    attempt, response, deadline
+                ):
+                    return response
+            attempt += 1
+
+    def _wait(self, attempt, response, deadline):
+        if attempt >= self.max_attempts:
+            return False
+        delay = None
+        if response is not None:
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+        if delay is None:
+            delay = self.backoff(attempt)
+        # A shutdown may have started since the first attempt.
+        remaining = time_left()
+        if self._clock() + delay > deadline or (
+            remaining is not None and delay >= remaining
+        ):
+            return False
+        self.sleep(delay)
+        return True
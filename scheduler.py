@@ -0,0 +1,64 @@
+import random
+
+from constants import IDLE_PERIOD, POLL_JITTER, RETRY_PERIOD, REVIEWING_PERIOD
+
+
+class FixedPolicy:
+    """Polls every `period` seconds whatever the homework status is."""
+
+    def __init__(self, period=RETRY_PERIOD):
+        self.period = period
+
+    def next_delay(self, last_status):
+        """Returns the seconds to wait before the next poll.
+
+        Arguments:
+            last_status (str): The last seen homework status or None.
+        """
+        return self.period
+
+
+class AdaptivePolicy:
+    """Chooses the poll period by the last seen homework status.
+
+    A homework under review is polled often, while a tenant without
+    homeworks or with an approved one is polled rarely. Every delay is
+    spread by a random jitter so the tenants do not poll together.
+
+    Arguments:
+        reviewing_period (float): Period while the homework is reviewed.
+        default_period (float): Period for any other status.
+        idle_period (float): Period without homeworks or after approval.
+        jitter (float): Relative spread of the delay, from 0 to 1.
+        rng (random.Random): Source of the jitter.
+    """
+
+    IDLE_STATUSES = (None, 'approved')
+
+    def __init__(
+        self,
+        reviewing_period=REVIEWING_PERIOD,
+        default_period=RETRY_PERIOD,
+        idle_period=IDLE_PERIOD,
+        jitter=POLL_JITTER,
+        rng=None,
+    ):
+        self.reviewing_period = reviewing_period
+        self.default_period = default_period
+        self.idle_period = idle_period
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+
+    def next_delay(self, last_status):
+        """Returns the seconds to wait before the next poll.
+
+        Arguments:
+            last_status (str): The last seen homework status or None.
+        """
+        if last_status == 'reviewing':
+            period = self.reviewing_period
+        elif last_status in self.IDLE_STATUSES:
+            period = self.idle_period
+        else:
+            period = self.default_period
+        return period * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
@@ -0,0 +1,157 @@
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import NamedTuple, Optional
+
+from exceptions import SchemaException
+
+
+class HomeworkStatus(str, Enum):
+    """Review status of a homework."""
+
+    APPROVED = 'approved'
+    REVIEWING = 'reviewing'
+    REJECTED = 'rejected'
+
+
+STATUSES = {status.value: status for status in HomeworkStatus}
+
+
+@dataclass(frozen=True, slots=True)
+class Homework:
+    """Fields of a homework used by the bot."""
+
+    id: Optional[int]
+    name: str
+    status: HomeworkStatus
+    date_updated: Optional[datetime] = None
+    lesson_name: Optional[str] = None
+    reviewer_comment: Optional[str] = None
+
+    @property
+    def key(self):
+        """Returns the key of the homework in a `HomeworkIndex`."""
+        return str(self.name if self.id is None else self.id)
+
+
+class ValidationResult(NamedTuple):
+    """Valid homeworks of a response and the errors of the invalid ones."""
+
+    homeworks: tuple
+    current_date: Optional[int]
+    errors: tuple
+
+
+def to_int(value):
+    """Accepts an integer which is not a boolean."""
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError('must be an integer')
+    return value
+
+
+def to_str(value):
+    """Accepts a string."""
+    if not isinstance(value, str):
+        raise TypeError('must be a string')
+    return value
+
+
+def to_status(value):
+    """Looks a known status up."""
+    try:
+        return STATUSES[value]
+    except (KeyError, TypeError):
+        raise ValueError(f'unknown status {value!r}') from None
+
+
+def to_date(value):
+    """Parses a date like 2020-02-13T14:40:57Z."""
+    value = to_str(value)
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+class ResponseValidator:
+    """Turns the API responses into `Homework` records in a single pass.
+
+    Each field is checked once and every error of a response is
+    collected. A homework with an error is left out and its errors are
+    returned next to the valid homeworks.
+
+    Arguments:
+        fields (tuple): (key, required, converter) triples in the order
+            of the `Homework` fields. A converter raises TypeError or
+            ValueError for an invalid value.
+    """
+
+    FIELDS = (
+        ('id', False, to_int),
+        ('homework_name', True, to_str),
+        ('status', True, to_status),
+        ('date_updated', False, to_date),
+        ('lesson_name', False, to_str),
+        ('reviewer_comment', False, to_str),
+    )
+
+    def __init__(self, fields=FIELDS):
+        self._fields = tuple(fields)
+
+    def validate(self, response):
+        """Validates a decoded API response.
+
+        Arguments:
+            response (dict): API response converted to Python data type.
+
+        Raises:
+            SchemaException: Exception if the response itself is invalid.
+
+        Returns:
+            ValidationResult: The homeworks, `current_date` and errors.
+        """
+        if not isinstance(response, dict):
+            raise SchemaException(['response: must be an object'])
+        errors = []
+        current_date = response.get('current_date')
+        if current_date is not None and (
+            isinstance(current_date, bool) or not isinstance(current_date, int)
+        ):
+            errors.append('current_date: must be an integer')
+        if 'homeworks' not in response:
+            errors.append('homeworks: is missing')
+        elif not isinstance(response['homeworks'], (list, type(None))):
+            errors.append('homeworks: must be a list')
+        if errors:
+            raise SchemaException(errors)
+        homeworks = []
+        for position, item in enumerate(response['homeworks'] or ()):
+            record = self.validate_homework(item, f'homeworks[{position}]')
+            if isinstance(record, Homework):
+                homeworks.append(record)
+            else:
+                errors.extend(record)
+        return ValidationResult(tuple(homeworks), current_date, tuple(errors))
+
+    def validate_homework(self, item, path='homework'):
+        """Returns the `Homework` record of an item or the list of errors."""
+        if not isinstance(item, dict):
+            return [f'{path}: must be an object']
+        values = []
+        errors = []
+        for key, required, convert in self._fields:
+            value = item.get(key)
+            if value is None:
+                if required:
+                    errors.append(f'{path}.{key}: is missing')
+                values.append(None)
+                continue
+            try:
+                values.append(convert(value))
+            except (TypeError, ValueError) as error:
+                errors.append(f'{path}.{key}: {error}')
+        if errors:
+            return errors
+        return Homework(*values)
+
+
+VALIDATOR = ResponseValidator()
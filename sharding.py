@@ -0,0 +1,197 @@
+import bisect
+import hashlib
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from constants import (
+    SHARD_DB_PATH,
+    SHARD_HEARTBEAT,
+    SHARD_LEASE_TTL,
+    SHARD_REPLICAS,
+    WORKER_ID,
+)
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    tenant_key TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+'''
+CLAIM = '''
+INSERT INTO leases VALUES (?, ?, ?)
+ON CONFLICT (tenant_key) DO UPDATE SET
+    worker_id = excluded.worker_id,
+    expires_at = excluded.expires_at
+WHERE leases.worker_id = excluded.worker_id OR leases.expires_at <= ?
+'''
+
+
+def hash_key(value):
+    """Returns a stable 64-bit hash of a string."""
+    return int.from_bytes(
+        hashlib.sha256(value.encode()).digest()[:8], 'big'
+    )
+
+
+class HashRing:
+    """Consistent hashing of the tenant keys to the workers.
+
+    A worker joining or leaving only moves about 1/N of the keys.
+
+    Arguments:
+        nodes (iterable): Worker IDs.
+        replicas (int): Points of every worker on the ring.
+    """
+
+    def __init__(self, nodes=(), replicas=SHARD_REPLICAS):
+        points = sorted(
+            (hash_key(f'{node}#{number}'), node)
+            for node in set(nodes)
+            for number in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key):
+        """Returns the worker a key belongs to, None for an empty ring."""
+        if not self._nodes:
+            return None
+        index = bisect.bisect(self._hashes, hash_key(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class ShardCoordinator:
+    """Splits the tenants between the workers sharing an SQLite database.
+
+    Every worker renews its membership lease on `heartbeat`. The live
+    workers are placed on a `HashRing` and each of them claims a lease
+    on the tenants the ring gives it. A tenant is only polled by the
+    holder of its lease, so it is never polled twice even while the
+    workers disagree about the ring. The leases of a dead worker expire
+    after `lease_ttl` seconds and are claimed by the others, and a worker
+    not renewing its leases in time stops owning them at the same time.
+
+    Arguments:
+        path (str): Path to the SQLite database shared by the workers.
+        worker_id (str): Unique ID of the worker, host and PID if None.
+        lease_ttl (float): Seconds a lease is valid for without renewal.
+        heartbeat_interval (float): Seconds between two rebalances.
+        replicas (int): Points of every worker on the ring.
+        clock (callable): Returns the current time, shared by the hosts.
+    """
+
+    def __init__(
+        self,
+        path=SHARD_DB_PATH,
+        worker_id=WORKER_ID,
+        lease_ttl=SHARD_LEASE_TTL,
+        heartbeat_interval=SHARD_HEARTBEAT,
+        replicas=SHARD_REPLICAS,
+        clock=time.time,
+    ):
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.replicas = replicas
+        self.owned = frozenset()
+        self.owned_until = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=lease_ttl, check_same_thread=False
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def owns(self, tenant_key):
+        """Tells whether the worker holds an unexpired lease of a tenant."""
+        return tenant_key in self.owned and self._clock() < self.owned_until
+
+    def heartbeat(self):
+        """Renews the membership of the worker.
+
+        Returns:
+            list: IDs of the live workers.
+        """
+        now = self._clock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO workers VALUES (?, ?)',
+                (self.worker_id, now + self.lease_ttl)
+            )
+            self._connection.execute(
+                'DELETE FROM workers WHERE expires_at <= ?', (now,)
+            )
+            return [
+                worker_id for worker_id, in self._connection.execute(
+                    'SELECT worker_id FROM workers'
+                )
+            ]
+
+    def assigned(self, tenant_keys):
+        """Returns the tenant keys the ring gives to the worker."""
+        ring = HashRing(self.heartbeat(), self.replicas)
+        return {
+            key for key in tenant_keys if ring.owner(key) == self.worker_id
+        }
+
+    def claim(self, tenant_keys, on_gained=None):
+        """Claims or renews the leases of the tenants.
+
+        Arguments:
+            tenant_keys (iterable): Keys of the tenants to be owned.
+            on_gained (callable): Called with the key of every newly
+                owned tenant before the worker starts polling it.
+
+        Returns:
+            frozenset: Keys of the tenants owned by the worker.
+        """
+        now = self._clock()
+        with self._lock, self._connection:
+            self._connection.executemany(CLAIM, (
+                (key, self.worker_id, now + self.lease_ttl, now)
+                for key in tenant_keys
+            ))
+            owned = frozenset(
+                key for key, in self._connection.execute(
+                    'SELECT tenant_key FROM leases '
+                    'WHERE worker_id = ? AND expires_at > ?',
+                    (self.worker_id, now)
+                )
+            )
+        # Expired leases may have been polled by another worker since.
+        previous = self.owned if now < self.owned_until else frozenset()
+        if on_gained is not None:
+            for key in owned - previous:
+                on_gained(key)
+        self.owned = owned
+        self.owned_until = now + self.lease_ttl
+        return owned
+
+    def release(self, tenant_keys):
+        """Gives the leases of the tenants up."""
+        tenant_keys = set(tenant_keys)
+        self.owned = self.owned - tenant_keys
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'DELETE FROM leases WHERE tenant_key = ? AND worker_id = ?',
+                ((key, self.worker_id) for key in tenant_keys)
+            )
+
+    def close(self):
+        """Releases every lease and leaves the ring."""
+        self.release(self.owned)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM workers WHERE worker_id = ?', (self.worker_id,)
+            )
+        self._connection.close()
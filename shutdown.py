@@ -0,0 +1,89 @@
+import logging
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from constants import SHUTDOWN_TIMEOUT
+from deadline import start_shutdown
+
+
+logger = logging.getLogger(__name__)
+
+SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+class GracefulShutdown:
+    """Turns SIGTERM and SIGINT into a clean stop of a polling loop.
+
+    A signal received while the loop waits in an `interruptible` block
+    ends the wait at once with SystemExit. Otherwise the current cycle
+    finishes with its network calls limited to `timeout` seconds, and
+    the loop stops before its next wait. If the process is still alive
+    after `timeout` seconds more, the watchdog kills it.
+
+    Arguments:
+        timeout (float): Seconds the shutdown may take.
+    """
+
+    def __init__(self, timeout=SHUTDOWN_TIMEOUT):
+        self.timeout = timeout
+        self.signum = None
+        self._event = threading.Event()
+        self._waiting = False
+
+    def install(self, signals=SIGNALS):
+        """Handles the signals with `request`. Call from the main thread."""
+        for signum in signals:
+            signal.signal(signum, self.request)
+        self.watch()
+
+    def watch(self):
+        """Starts the watchdog reporting and limiting the shutdown."""
+        threading.Thread(
+            target=self._watch, name='shutdown-watchdog', daemon=True
+        ).start()
+
+    def request(self, signum=None, frame=None):
+        """Starts the shutdown.
+
+        Safe to be a signal handler: it takes no locks the interrupted
+        code may hold, the logging is left to the watchdog.
+        """
+        if self._event.is_set():
+            return
+        self.signum = signum
+        start_shutdown(self.timeout)
+        self._event.set()
+        if self._waiting:
+            raise SystemExit(0)
+
+    def is_set(self):
+        """Tells whether the shutdown is requested."""
+        return self._event.is_set()
+
+    @contextmanager
+    def interruptible(self):
+        """Lets a shutdown signal end the wait inside the block."""
+        if self._event.is_set():
+            raise SystemExit(0)
+        self._waiting = True
+        try:
+            yield
+        finally:
+            self._waiting = False
+
+    def _watch(self):
+        self._event.wait()
+        logger.info('Shutting down on the signal %s.', self.signum)
+        time.sleep(2 * self.timeout)
+        self._kill()
+
+    def _kill(self):
+        logger.critical('Shutdown is not complete in time, killing.')
+        logging.shutdown()
+        os._exit(1)
+
+
+SHUTDOWN = GracefulShutdown()
@@ -0,0 +1,202 @@
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+from constants import STATE_BATCH_SIZE, STATE_DB_PATH, STATE_FLUSH_INTERVAL
+from schema import Homework
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cursors (
+    tenant_key TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS statuses (
+    tenant_key TEXT NOT NULL,
+    homework_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (tenant_key, homework_id)
+) WITHOUT ROWID;
+'''
+
+
+class TenantRecord(NamedTuple):
+    """Persisted polling state of a tenant."""
+
+    current_date: int
+    statuses: dict
+
+
+class StateStore:
+    """Durable storage of the poll cursors and delivered statuses.
+
+    The writes are buffered in memory and committed in a single
+    transaction once `batch_size` of them are pending or
+    `flush_interval` seconds have passed since the last commit.
+
+    Arguments:
+        path (str): Path to the SQLite database file.
+        batch_size (int): Pending writes which trigger a commit.
+        flush_interval (float): Seconds after which the writes are
+            committed whatever their amount is.
+        clock (callable): Returns the current monotonic time.
+    """
+
+    def __init__(
+        self,
+        path=STATE_DB_PATH,
+        batch_size=STATE_BATCH_SIZE,
+        flush_interval=STATE_FLUSH_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cursors = {}
+        self._statuses = {}
+        self._last_flush = clock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+
+    def load(self):
+        """Loads the state of every tenant.
+
+        Returns:
+            dict: TenantRecord instances by the tenant keys.
+        """
+        with self._lock:
+            records = {
+                tenant_key: TenantRecord(current_date, {})
+                for tenant_key, current_date in self._connection.execute(
+                    'SELECT tenant_key, from_date FROM cursors'
+                )
+            }
+            for tenant_key, homework_id, status in self._connection.execute(
+                'SELECT tenant_key, homework_id, status FROM statuses'
+            ):
+                records.setdefault(
+                    tenant_key, TenantRecord(None, {})
+                ).statuses[homework_id] = status
+        return records
+
+    def load_tenant(self, tenant_key):
+        """Loads the state of a single tenant.
+
+        Returns:
+            TenantRecord: The state of the tenant or None.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                'SELECT from_date FROM cursors WHERE tenant_key = ?',
+                (tenant_key,)
+            ).fetchone()
+            statuses = dict(self._connection.execute(
+                'SELECT homework_id, status FROM statuses '
+                'WHERE tenant_key = ?',
+                (tenant_key,)
+            ))
+        if cursor is None and not statuses:
+            return None
+        return TenantRecord(cursor and cursor[0], statuses)
+
+    def save_cursor(self, tenant_key, current_date):
+        """Buffers the new `current_date` cursor of a tenant."""
+        with self._lock:
+            self._cursors[tenant_key] = current_date
+        self._maybe_flush()
+
+    def save_status(self, tenant_key, homework_id, status):
+        """Buffers the last delivered status of a homework."""
+        with self._lock:
+            self._statuses[tenant_key, str(homework_id)] = status
+        self._maybe_flush()
+
+    def flush(self):
+        """Commits every pending write in a single transaction."""
+        with self._lock:
+            cursors, self._cursors = self._cursors, {}
+            statuses, self._statuses = self._statuses, {}
+            self._last_flush = self._clock()
+            if not cursors and not statuses:
+                return
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO cursors VALUES (?, ?)',
+                    cursors.items()
+                )
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?)',
+                    (key + (status,) for key, status in statuses.items())
+                )
+
+    def close(self):
+        """Commits the pending writes and closes the database."""
+        self.flush()
+        self._connection.close()
+
+    def _maybe_flush(self):
+        pending = len(self._cursors) + len(self._statuses)
+        if (
+            pending >= self.batch_size
+            or self._clock() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+
+class HomeworkIndex:
+    """Last delivered status of every homework keyed by the homework id.
+
+    Arguments:
+        statuses (dict): Known statuses by the homework ids.
+    """
+
+    __slots__ = ('_statuses',)
+
+    def __init__(self, statuses=None):
+        self._statuses = dict(statuses or {})
+
+    @staticmethod
+    def key(homework):
+        """Returns the index key of a homework dict or record."""
+        if isinstance(homework, Homework):
+            return homework.key
+        return str(homework.get('id', homework.get('homework_name')))
+
+    @staticmethod
+    def status(homework):
+        """Returns the status of a homework dict or record."""
+        if isinstance(homework, Homework):
+            return homework.status.value
+        return homework['status']
+
+    def changes(self, homeworks):
+        """Yields the homeworks whose status differs from the indexed one.
+
+        The homeworks which are neither dictionaries nor `Homework`
+        records are yielded too, so the validation downstream reports them.
+
+        Arguments:
+            homeworks (list): Homeworks from the API response.
+        """
+        for homework in homeworks:
+            if isinstance(homework, Homework):
+                if self._statuses.get(homework.key) != homework.status.value:
+                    yield homework
+            elif (
+                not isinstance(homework, dict)
+                or self._statuses.get(self.key(homework))
+                != homework.get('status')
+            ):
+                yield homework
+
+    def update(self, homework):
+        """Stores the status of a delivered homework."""
+        self._statuses[self.key(homework)] = self.status(homework)
+
+    def statuses(self):
+        """Returns a view of the indexed statuses."""
+        return self._statuses.values()
@@ -0,0 +1,24 @@
+import hashlib
+from contextvars import ContextVar
+from typing import NamedTuple, Optional
+
+
+class Tenant(NamedTuple):
+    """A pair of Practicum token and Telegram chat served by the bot.
+
+    The messages are rendered in the `locale` of the tenant, in the
+    default one if it is None.
+    """
+
+    practicum_token: str
+    chat_id: str
+    locale: Optional[str] = None
+
+    @property
+    def key(self):
+        """Stable tenant identifier which does not reveal the token."""
+        digest = hashlib.sha256(self.practicum_token.encode()).hexdigest()
+        return f'{self.chat_id}:{digest[:16]}'
+
+
+current_tenant = ContextVar('current_tenant', default=None)
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from backfill import HomeworkStream, backfill
+from state import HomeworkIndex
+from tenants import Tenant, current_tenant
+
+
+def chunked(data, size):
+    payload = json.dumps(data, ensure_ascii=False).encode()
+    return [payload[start:start + size]
+            for start in range(0, len(payload), size)]
+
+
+def make_history(count):
+    return {
+        'current_date': 1000198991,
+        'homeworks': [
+            {
+                'id': number,
+                'homework_name': f'hw{number}.zip',
+                'status': 'approved',
+                'lesson_name': 'Проект спринта',
+            }
+            for number in range(count)
+        ],
+    }
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_stream_yields_every_homework(chunk_size):
+    history = make_history(50)
+    stream = HomeworkStream(chunked(history, chunk_size))
+    assert list(stream) == history['homeworks']
+    assert stream.members == {'current_date': 1000198991}
+
+
+def test_stream_keeps_only_one_item_in_memory():
+    history = make_history(2000)
+    stream = HomeworkStream(chunked(history, 64), max_item_size=200)
+    assert sum(1 for _ in stream) == 2000
+
+
+@pytest.mark.parametrize('payload', [
+    b'{"homeworks": [{"id": 1}',
+    b'{"homeworks": [{"id": 1} {"id": 2}]}',
+    b'[]',
+])
+def test_stream_rejects_malformed_payload(payload):
+    with pytest.raises(ValueError):
+        list(HomeworkStream([payload]))
+
+
+class StreamedResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.data = data
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return chunked(self.data, 16)
+
+    def close(self):
+        self.closed = True
+
+
+def test_backfill_rebuilds_index(monkeypatch, caplog):
+    import requests
+
+    history = make_history(3)
+    history['homeworks'].append({'id': 99, 'status': 'unknown'})
+    history['homeworks'].append(
+        {'id': '100', 'homework_name': 'hw100.zip', 'status': 'approved'}
+    )
+    response = StreamedResponse(history)
+    requested = []
+
+    def mock_get(*args, **kwargs):
+        requested.append(kwargs)
+        return response
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    index = HomeworkIndex()
+    changes = []
+    token = current_tenant.set(Tenant('token', '1'))
+    try:
+        current_date = backfill(
+            index, 0, lambda record, message: changes.append(message)
+        )
+    finally:
+        current_tenant.reset(token)
+
+    assert current_date == 1000198991
+    assert requested[0]['stream'] is True
+    assert requested[0]['params'] == {'from_date': 0}
+    assert len(changes) == 3
+    assert sorted(index.statuses()) == ['approved'] * 3
+    assert response.closed
+    assert 'homeworks[4].id: must be an integer' in caplog.text
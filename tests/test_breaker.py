@@ -0,0 +1,69 @@
+import pytest
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exceptions import CircuitOpenException, StatusCodeException
+
+
+class Clock:
+    now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(
+        'practicum.yandex.ru', failure_threshold=3, recovery_timeout=60,
+        half_open_probes=1, clock=clock
+    )
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_request()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(breaker):
+    fail(breaker, 2)
+    breaker.before_request()
+    breaker.record_success()
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenException):
+        breaker.before_request()
+
+
+def test_open_circuit_error_is_status_code_error():
+    assert issubclass(CircuitOpenException, StatusCodeException)
+
+
+def test_half_open_allows_sparse_probes(breaker, clock):
+    fail(breaker, 3)
+    clock.now = 60
+    assert breaker.state == HALF_OPEN
+    breaker.before_request()
+    with pytest.raises(CircuitOpenException):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_request()
+
+
+def test_failed_probe_opens_again(breaker, clock):
+    fail(breaker, 3)
+    clock.now = 60
+    fail(breaker, 1)
+    assert breaker.state == OPEN
+    clock.now = 100
+    assert breaker.state == OPEN
+    clock.now = 120
+    assert breaker.state == HALF_OPEN
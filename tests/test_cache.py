@@ -0,0 +1,83 @@
+import json
+from http import HTTPStatus
+
+from cache import ResponseCache
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode() if data else b''
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeServer:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, url, headers=None, params=None, **kwargs):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+class Clock:
+    now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def fetch(cache, server):
+    return cache.fetch(
+        server, 'https://practicum.yandex.ru/api/',
+        headers={'Authorization': 'OAuth token'}, params={'from_date': 0}
+    )
+
+
+def test_fresh_response_is_served_without_request():
+    server = FakeServer(FakeResponse(HTTPStatus.OK, {'homeworks': []}))
+    cache = ResponseCache(ttl=30, clock=Clock())
+    first = fetch(cache, server)
+    assert fetch(cache, server) is first
+    assert first.json() == {'homeworks': []}
+    assert len(server.requests) == 1
+
+
+def test_not_modified_response_reuses_cached_one():
+    clock = Clock()
+    server = FakeServer(
+        FakeResponse(HTTPStatus.OK, {'homeworks': []}, {'ETag': '"v1"'}),
+        FakeResponse(HTTPStatus.NOT_MODIFIED),
+    )
+    cache = ResponseCache(ttl=30, clock=clock)
+    first = fetch(cache, server)
+    clock.now = 60
+    assert fetch(cache, server) is first
+    assert server.requests[1]['If-None-Match'] == '"v1"'
+
+
+def test_payload_with_new_current_date_only_is_not_parsed_again():
+    clock = Clock()
+    server = FakeServer(
+        FakeResponse(HTTPStatus.OK, {'homeworks': [], 'current_date': 1}),
+        FakeResponse(HTTPStatus.OK, {'homeworks': [], 'current_date': 2}),
+        FakeResponse(HTTPStatus.OK, {'homeworks': [{}], 'current_date': 3}),
+    )
+    cache = ResponseCache(ttl=0, clock=clock)
+    first = fetch(cache, server)
+    assert fetch(cache, server) is first
+    assert fetch(cache, server).json()['current_date'] == 3
+
+
+def test_error_response_is_not_cached():
+    server = FakeServer(
+        FakeResponse(HTTPStatus.BAD_GATEWAY),
+        FakeResponse(HTTPStatus.OK, {'homeworks': []}),
+    )
+    cache = ResponseCache(clock=Clock())
+    assert fetch(cache, server).status_code == HTTPStatus.BAD_GATEWAY
+    assert fetch(cache, server).status_code == HTTPStatus.OK
@@ -0,0 +1,150 @@
+import json
+import os
+import re
+
+import pytest
+
+TOML = '''
+[settings]
+reviewing_period = 30
+digest_window = 0
+
+[[tenants]]
+practicum_token = "token1"
+chat_id = "1"
+
+[[tenants]]
+practicum_token = "token2"
+chat_id = 2
+locale = "en"
+'''
+
+
+@pytest.fixture
+def tenants_file(tmp_path):
+    path = tmp_path / 'tenants.toml'
+    path.write_text(TOML, encoding='utf-8')
+    return path
+
+
+def load(**environ):
+    from config import load_config
+    return load_config({'TELEGRAM_TOKEN': '1234:abcdefg', **environ})
+
+
+def test_single_tenant_comes_from_the_environment():
+    from tenants import Tenant
+
+    config = load(PRACTICUM_TOKEN='token', TELEGRAM_CHAT_ID='12345')
+
+    assert config.tenants == (Tenant('token', '12345'),)
+    assert config.tenants_file is None
+
+
+def test_every_problem_is_reported_at_once():
+    from config import load_config
+    from exceptions import ConfigException
+
+    with pytest.raises(ConfigException) as error:
+        load_config({})
+
+    assert error.value.errors == [
+        'TELEGRAM_TOKEN: required',
+        'PRACTICUM_TOKEN: required without TENANTS_FILE',
+        'TELEGRAM_CHAT_ID: required without TENANTS_FILE',
+    ]
+
+
+def test_tenants_and_settings_come_from_a_toml_file(tenants_file):
+    from tenants import Tenant
+
+    config = load(TENANTS_FILE=str(tenants_file))
+
+    assert config.tenants == (
+        Tenant('token1', '1'), Tenant('token2', '2', 'en')
+    )
+    assert config.reviewing_period == 30
+    assert config.digest_window == 0
+    assert config.policy().reviewing_period == 30
+
+
+def test_json_list_is_still_accepted(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text(json.dumps(
+        [{'practicum_token': 'token1', 'chat_id': '1'}]
+    ), encoding='utf-8')
+
+    assert len(load(TENANTS_FILE=str(path)).tenants) == 1
+
+
+@pytest.mark.parametrize('content, message', [
+    ('[settings]\nidle_period = 0\n[[tenants]]\n'
+     'practicum_token = "t"\nchat_id = "1"',
+     'settings.idle_period: expected a number of at least 1'),
+    ('[settings]\npoll = 1\n[[tenants]]\n'
+     'practicum_token = "t"\nchat_id = "1"',
+     'settings.poll: unknown setting'),
+    ('[[tenants]]\nchat_id = "1"',
+     'tenants[0].practicum_token: required string'),
+    ('[[tenants]]\npracticum_token = "t"\nchat_id = "1"\nlocale = "xx"',
+     "tenants[0].locale: unknown locale 'xx'"),
+    ('[[tenants]]\npracticum_token = "t"\nchat_id = "1"\n'
+     '[[tenants]]\npracticum_token = "t"\nchat_id = "1"',
+     'tenants[1]: duplicate of chat 1'),
+    ('tenants = []', 'tenants: expected a non-empty list'),
+    ('tenants = [', 'tenants.toml: '),
+])
+def test_invalid_file_is_rejected(tmp_path, content, message):
+    from exceptions import ConfigException
+
+    path = tmp_path / 'tenants.toml'
+    path.write_text(content, encoding='utf-8')
+
+    with pytest.raises(ConfigException, match=re.escape(message)):
+        load(TENANTS_FILE=str(path))
+
+
+def test_diff_keys_the_tenants_by_chat_and_token():
+    from config import diff_tenants
+    from tenants import Tenant
+
+    kept, removed, changed = (
+        Tenant('a', '1'), Tenant('b', '2'), Tenant('c', '3')
+    )
+    moved = Tenant('d', '2')
+
+    diff = diff_tenants(
+        [kept, removed, changed], [kept, changed._replace(locale='en'), moved]
+    )
+
+    assert diff.added == (moved,)
+    assert diff.removed == (removed,)
+    assert diff.changed == (changed._replace(locale='en'),)
+    assert not diff_tenants([kept], [kept])
+
+
+def test_reloader_keeps_the_last_valid_config(tenants_file, monkeypatch):
+    from config import ConfigReloader
+
+    monkeypatch.setenv('TELEGRAM_TOKEN', '1234:abcdefg')
+    monkeypatch.setenv('TENANTS_FILE', str(tenants_file))
+    reloader = ConfigReloader()
+    valid = reloader.config
+
+    assert not reloader.changed()
+    assert reloader.reload() is None
+
+    tenants_file.write_text('tenants = [', encoding='utf-8')
+    os.utime(tenants_file, ns=(0, 0))
+    assert reloader.changed()
+    assert reloader.reload() is None
+    assert reloader.config is valid
+    assert not reloader.changed()
+
+    tenants_file.write_text(
+        TOML.replace('reviewing_period = 30', 'reviewing_period = 45'),
+        encoding='utf-8'
+    )
+    config = reloader.reload()
+    assert config.reviewing_period == 45
+    assert reloader.config is config
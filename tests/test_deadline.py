@@ -0,0 +1,85 @@
+import contextvars
+
+import pytest
+import requests
+
+import tests.check_utils as check_utils
+from deadline import Deadline, clip, current_deadline, get_timeout
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def run_with_deadline(deadline, func, *args):
+    context = contextvars.copy_context()
+    context.run(current_deadline.set, deadline)
+    return context.run(func, *args)
+
+
+def test_timeouts_are_unchanged_without_deadline():
+    assert get_timeout(5, 15) == (5, 15)
+
+
+def test_timeouts_are_limited_by_the_remaining_budget():
+    clock = Clock()
+    deadline = Deadline(10, clock)
+    clock.now = 7
+
+    assert run_with_deadline(deadline, get_timeout, 5, 15) == (3, 3)
+
+
+def test_expired_deadline_raises_timeout():
+    clock = Clock()
+    deadline = Deadline(1, clock)
+    clock.now = 2
+
+    with pytest.raises(requests.Timeout):
+        run_with_deadline(deadline, clip, 5)
+
+
+def test_every_api_request_has_a_timeout(monkeypatch, random_timestamp):
+    import homework
+    seen = []
+
+    def mock_get(*args, **kwargs):
+        seen.append(kwargs.get('timeout'))
+        return check_utils.MockResponseGET(random_timestamp=random_timestamp)
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    homework.get_api_answer(random_timestamp)
+
+    assert seen and all(seen)
+
+
+def test_api_timeout_has_its_own_exception(monkeypatch):
+    import homework
+    from exceptions import TimeoutException
+    from metrics import TIMEOUTS
+
+    def mock_get(*args, **kwargs):
+        raise requests.ReadTimeout('read timed out')
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    before = TIMEOUTS.value(call='practicum')
+    with pytest.raises(TimeoutException):
+        homework.get_api_answer(0)
+
+    assert TIMEOUTS.value(call='practicum') == before + 1
+
+
+def test_send_timeout_has_its_own_exception():
+    import homework
+    from exceptions import SendTimeoutException
+
+    class HangingBot:
+        def send_message(self, **kwargs):
+            assert kwargs['timeout']
+            raise requests.ConnectTimeout('connect timed out')
+
+    with pytest.raises(SendTimeoutException):
+        homework.send_message(HangingBot(), 'message')
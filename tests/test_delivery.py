@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from telebot import apihelper
+
+import tests.check_utils as check_utils
+from delivery import DeliveryQueue, TokenBucket
+from tenants import Tenant
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, secs):
+        self.now += secs
+
+
+class FlakyBot(check_utils.MockTelegramBot):
+    def __init__(self, failures=0):
+        super().__init__()
+        self.failures = failures
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise apihelper.ApiTelegramException('sendMessage', None, {
+                'error_code': 429,
+                'description': 'Too Many Requests: retry after 7',
+                'parameters': {'retry_after': 7},
+            })
+        self.sent.append((chat_id, text))
+
+
+def deliver(queue, deliveries):
+    async def run():
+        queue.start()
+        for tenant, text in deliveries:
+            queue.put(tenant, text)
+        await queue.join()
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_token_bucket_reservations():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0.5, 1]
+    clock.now = 10
+    assert bucket.reserve() == 0
+
+
+def test_chat_rate_limit_is_respected():
+    clock = Clock()
+    bot = FlakyBot()
+    queue = DeliveryQueue(
+        bot, workers=1, chat_rate=1, sleep=clock.sleep, clock=clock
+    )
+    tenant = Tenant('token', '1')
+    deliver(queue, [(tenant, str(number)) for number in range(3)])
+
+    assert [text for _, text in bot.sent] == ['0', '1', '2']
+    assert clock.now == 2
+
+
+def test_retry_after_is_honoured():
+    clock = Clock()
+    bot = FlakyBot(failures=1)
+    queue = DeliveryQueue(bot, workers=1, sleep=clock.sleep, clock=clock)
+    deliver(queue, [(Tenant('token', '1'), 'text')])
+
+    assert bot.sent == [('1', 'text')]
+    assert clock.now >= 7
+
+
+def test_delivery_is_dropped_after_max_attempts():
+    clock = Clock()
+    bot = FlakyBot(failures=10)
+    queue = DeliveryQueue(
+        bot, workers=1, max_attempts=3, sleep=clock.sleep, clock=clock
+    )
+    deliver(queue, [(Tenant('token', '1'), 'text')])
+
+    assert bot.sent == []
+    assert bot.failures == 7
+
+
+def test_retry_does_not_hold_the_worker_up():
+    started = time.monotonic()
+    sent_at = {}
+
+    class RecordingBot(FlakyBot):
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            super().send_message(chat_id, text, **kwargs)
+            sent_at[chat_id] = time.monotonic() - started
+
+    async def sleep(secs):
+        await asyncio.sleep(secs / 10)
+
+    bot = RecordingBot(failures=1)
+    queue = DeliveryQueue(bot, workers=1, sleep=sleep)
+    deliver(queue, [(Tenant('token', '1'), 'first'),
+                    (Tenant('token', '2'), 'second')])
+
+    assert [chat_id for chat_id, _ in bot.sent] == ['2', '1']
+    assert sent_at['2'] < 0.3 < sent_at['1']
@@ -0,0 +1,66 @@
+import asyncio
+
+from digest import Change, DigestBuffer, pack
+from tenants import Tenant
+
+TENANT = Tenant('token', '1')
+
+
+class RecordingDelivery:
+    def __init__(self):
+        self.sent = []
+
+    def put(self, tenant, text, on_delivered=None, key=None):
+        self.sent.append((tenant.chat_id, text, key))
+        if on_delivered is not None:
+            on_delivered()
+
+
+def collect(window, changes, pause=0.05):
+    delivery = RecordingDelivery()
+    digests = DigestBuffer(delivery, window)
+
+    async def run():
+        digests.start()
+        for change in changes:
+            digests.add(TENANT, *change)
+        await asyncio.sleep(pause)
+
+    asyncio.run(run())
+    return delivery.sent
+
+
+def test_changes_in_a_window_are_coalesced():
+    delivered = []
+    sent = collect(0.01, [
+        ('1', 'first reviewing', None, 'first:reviewing'),
+        ('2', 'second approved', None, 'second:approved'),
+        ('1', 'first rejected', lambda: delivered.append('1'),
+         'first:rejected'),
+    ])
+
+    assert len(sent) == 1
+    assert sent[0][1] == 'second approved\n\nfirst rejected'
+    assert sent[0][2].startswith('digest:')
+    assert delivered == ['1']
+
+
+def test_single_change_is_sent_as_is():
+    sent = collect(0.01, [('1', 'text', None, 'key')])
+
+    assert sent == [('1', 'text', 'key')]
+
+
+def test_zero_window_sends_right_away():
+    sent = collect(0, [('1', 'first'), ('1', 'second')], pause=0)
+
+    assert [text for _, text, _ in sent] == ['first', 'second']
+
+
+def test_digest_respects_the_length_limit():
+    changes = [Change('x' * 30), Change('y' * 30), Change('z' * 100)]
+    messages = pack(changes, limit=64)
+
+    assert [len(message) for message in messages] == [2, 1]
+    assert len(messages[1][0].text) == 64
+    assert messages[1][0].text.endswith('…')
@@ -0,0 +1,517 @@
+import asyncio
+import threading
+import time
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import tests.check_utils as check_utils
+
+old_sleep = time.sleep
+
+
+class RecordingBot(check_utils.MockTelegramBot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class MockClient:
+    def __init__(self, get):
+        self.get = get
+
+    def close(self):
+        pass
+
+
+async def stop_after_first_cycle(secs):
+    raise check_utils.BreakInfiniteLoop('break')
+
+
+@pytest.fixture
+def engine_module():
+    import engine
+    return engine
+
+
+@pytest.fixture
+def make_engine(engine_module, tmp_path):
+    from delivery import DeliveryQueue
+    from state import StateStore
+
+    def make(tenants, bot, get, **kwargs):
+        kwargs.setdefault('sleep', stop_after_first_cycle)
+        kwargs.setdefault('backfill_new', False)
+        kwargs.setdefault('client', MockClient(get))
+        return engine_module.PollingEngine(
+            tenants, bot,
+            store=StateStore(str(tmp_path / 'state.db')),
+            delivery=DeliveryQueue(bot, workers=1, chat_rate=1000),
+            **kwargs
+        )
+
+    return make
+
+
+@pytest.fixture
+def tenants():
+    from tenants import Tenant
+    return [Tenant(f'token{number}', str(number)) for number in range(5)]
+
+
+def run_until_break(engine):
+    with pytest.raises(check_utils.BreakInfiniteLoop):
+        asyncio.run(engine.run())
+
+
+def test_every_tenant_is_polled_with_its_token(
+        make_engine, tenants, data_with_new_hw_status
+):
+    seen_tokens = []
+
+    def mock_get(*args, **kwargs):
+        seen_tokens.append(kwargs['headers']['Authorization'])
+        return check_utils.MockResponseGET(data=data_with_new_hw_status)
+
+    bot = RecordingBot()
+    run_until_break(make_engine(tenants, bot, mock_get))
+
+    assert sorted(seen_tokens) == sorted(
+        f'OAuth {tenant.practicum_token}' for tenant in tenants
+    )
+    assert sorted(chat_id for chat_id, _ in bot.sent) == sorted(
+        tenant.chat_id for tenant in tenants
+    )
+
+
+def test_concurrency_is_bounded(make_engine, tenants, random_timestamp):
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def mock_get(*args, **kwargs):
+        with lock:
+            running.append(None)
+            peak.append(len(running))
+        old_sleep(0.01)
+        with lock:
+            running.pop()
+        return check_utils.MockResponseGET(random_timestamp=random_timestamp)
+
+    async def keep_polling(secs):
+        if len(peak) >= 3 * len(tenants):
+            raise check_utils.BreakInfiniteLoop('break')
+
+    run_until_break(make_engine(
+        tenants, RecordingBot(), mock_get,
+        max_concurrency=2, sleep=keep_polling
+    ))
+
+    assert max(peak) <= 2
+
+
+def test_restart_resumes_from_the_stored_cursor(
+        make_engine, tenants, data_with_new_hw_status
+):
+    seen_dates = []
+
+    def mock_get(*args, **kwargs):
+        seen_dates.append(kwargs['params']['from_date'])
+        return check_utils.MockResponseGET(data=data_with_new_hw_status)
+
+    bot = RecordingBot()
+    for _ in range(2):
+        run_until_break(make_engine(tenants[:1], bot, mock_get))
+
+    assert seen_dates[1] == data_with_new_hw_status['current_date']
+    assert len(bot.sent) == 1
+
+
+def test_unchanged_payload_is_revalidated_and_not_parsed_again(
+        make_engine, tenants, random_timestamp
+):
+    from cache import ResponseCache
+    from http_client import PooledClient
+
+    sent_headers = []
+    parsed = []
+    cycles = []
+
+    class Response(check_utils.MockResponseGET):
+        content = b'{"homeworks": []}'
+        headers = {'ETag': '"v1"'}
+
+        def json(self):
+            parsed.append(self)
+            return super().json()
+
+    def session_get(url, headers=None, params=None, **kwargs):
+        sent_headers.append(headers)
+        if len(sent_headers) == 1:
+            return Response(random_timestamp=random_timestamp)
+        return Response(http_status=HTTPStatus.NOT_MODIFIED)
+
+    async def sleep(secs):
+        cycles.append(secs)
+        if len(cycles) == 2:
+            raise check_utils.BreakInfiniteLoop('break')
+
+    client = PooledClient(cache=ResponseCache(ttl=0), circuit_breaker=False)
+    client._session.get = session_get
+    bot = RecordingBot()
+    run_until_break(
+        make_engine(tenants[:1], bot, None, client=client, sleep=sleep)
+    )
+
+    assert len(sent_headers) == 2
+    assert sent_headers[1]['If-None-Match'] == '"v1"'
+    assert len(parsed) == 1
+    assert bot.sent == []
+
+
+def test_response_failed_to_handle_is_handled_again(
+        make_engine, tenants, data_with_new_hw_status
+):
+    import sqlite3
+
+    from cache import CachedResponse
+
+    response = CachedResponse(data_with_new_hw_status)
+    cycles = []
+
+    async def sleep(secs):
+        cycles.append(secs)
+        if len(cycles) == 2:
+            raise check_utils.BreakInfiniteLoop('break')
+
+    bot = RecordingBot()
+    engine = make_engine(
+        tenants[:1], bot, lambda *args, **kwargs: response, sleep=sleep,
+        digest_window=0
+    )
+    add = engine.digests.add
+
+    def locked_once(*args):
+        if len(cycles) == 0:
+            raise sqlite3.OperationalError('database is locked')
+        add(*args)
+
+    engine.digests.add = locked_once
+    run_until_break(engine)
+
+    assert any('hw123.zip' in text for _, text in bot.sent)
+
+
+def test_every_changed_homework_is_delivered(
+        make_engine, tenants, random_timestamp
+):
+    data = {
+        'homeworks': [
+            {'id': 2, 'homework_name': 'second.zip', 'status': 'reviewing'},
+            {'id': 1, 'homework_name': 'first.zip', 'status': 'approved'},
+        ],
+        'current_date': random_timestamp,
+    }
+    bot = RecordingBot()
+    run_until_break(make_engine(
+        tenants[:1], bot,
+        lambda **kwargs: check_utils.MockResponseGET(data=data),
+        digest_window=0
+    ))
+
+    texts = [text for _, text in bot.sent]
+    assert len(texts) == 2
+    assert 'first.zip' in texts[0]
+    assert 'second.zip' in texts[1]
+
+
+def test_changes_of_a_cycle_are_sent_as_a_digest(
+        make_engine, tenants, random_timestamp
+):
+    data = {
+        'homeworks': [
+            {'id': 2, 'homework_name': 'second.zip', 'status': 'reviewing'},
+            {'id': 1, 'homework_name': 'first.zip', 'status': 'approved'},
+        ],
+        'current_date': random_timestamp,
+    }
+    bot = RecordingBot()
+    run_until_break(make_engine(
+        tenants[:1], bot,
+        lambda **kwargs: check_utils.MockResponseGET(data=data)
+    ))
+
+    assert len(bot.sent) == 1
+    text = bot.sent[0][1]
+    assert text.index('first.zip') < text.index('second.zip')
+
+
+def test_cursor_is_held_back_while_the_digest_holds_changes(
+        make_engine, tenants, data_with_new_hw_status, tmp_path
+):
+    from state import StateStore
+
+    def mock_get(*args, **kwargs):
+        return check_utils.MockResponseGET(data=data_with_new_hw_status)
+
+    stored = []
+
+    async def crash(secs):
+        engine.store.flush()
+        stored.append(engine.store.load_tenant(tenants[0].key).current_date)
+        raise check_utils.BreakInfiniteLoop('break')
+
+    engine = make_engine(
+        tenants[:1], RecordingBot(), mock_get, sleep=crash, digest_window=60
+    )
+    started = int(time.time())
+    run_until_break(engine)
+    store = StateStore(str(tmp_path / 'state.db'))
+
+    assert stored[0] >= started
+    assert store.load_tenant(tenants[0].key).current_date == (
+        data_with_new_hw_status['current_date']
+    )
+    store.close()
+
+
+def test_hung_cycle_is_abandoned(
+        make_engine, engine_module, tenants, monkeypatch
+):
+    from metrics import TIMEOUTS
+
+    def hanging_get(*args, **kwargs):
+        old_sleep(0.3)
+        raise requests.ReadTimeout('read timed out')
+
+    monkeypatch.setattr(engine_module, 'CYCLE_GRACE', 0)
+    before = TIMEOUTS.value(call='cycle')
+    run_until_break(make_engine(
+        tenants[:1], RecordingBot(), hanging_get, cycle_budget=0.05
+    ))
+
+    assert TIMEOUTS.value(call='cycle') == before + 1
+
+
+def test_invalid_homework_does_not_block_the_valid_ones(
+        make_engine, tenants, random_timestamp
+):
+    data = {
+        'homeworks': [
+            {'id': 2, 'homework_name': 'broken.zip', 'status': 'unknown'},
+            {'id': 1, 'homework_name': 'valid.zip', 'status': 'approved'},
+        ],
+        'current_date': random_timestamp,
+    }
+    bot = RecordingBot()
+    run_until_break(make_engine(
+        tenants[:1], bot,
+        lambda **kwargs: check_utils.MockResponseGET(data=data)
+    ))
+
+    assert len(bot.sent) == 1
+    assert 'valid.zip' in bot.sent[0][1]
+
+
+def test_engine_polls_only_its_own_tenants(
+        make_engine, tenants, random_timestamp, tmp_path
+):
+    from sharding import HashRing, ShardCoordinator
+
+    path = str(tmp_path / 'shards.db')
+    ShardCoordinator(path, 'other').heartbeat()
+    shard = ShardCoordinator(path, 'engine')
+    polled = []
+
+    def mock_get(*args, **kwargs):
+        polled.append(kwargs['headers']['Authorization'][6:])
+        return check_utils.MockResponseGET(random_timestamp=random_timestamp)
+
+    async def sleep(secs):
+        await asyncio.sleep(0)
+        if secs == shard.heartbeat_interval or len(polled) > 20:
+            raise check_utils.BreakInfiniteLoop('break')
+
+    engine = make_engine(tenants, check_utils.MockTelegramBot(), mock_get,
+                         sleep=sleep, shard=shard)
+    with pytest.raises(check_utils.BreakInfiniteLoop):
+        asyncio.run(engine.run())
+
+    owned = {
+        tenant.practicum_token for tenant in tenants
+        if HashRing(['other', 'engine']).owner(tenant.key) == 'engine'
+    }
+    assert polled
+    assert set(polled) == owned
+
+
+def test_leases_are_renewed_while_the_pollers_are_busy(
+        make_engine, tenants, tmp_path
+):
+    from sharding import ShardCoordinator
+
+    shard = ShardCoordinator(
+        str(tmp_path / 'shards.db'), 'engine', heartbeat_interval=0.02
+    )
+    claims = []
+    claim = shard.claim
+
+    def counting_claim(*args):
+        claims.append(None)
+        return claim(*args)
+
+    shard.claim = counting_claim
+    released = threading.Event()
+
+    def mock_get(*args, **kwargs):
+        released.wait(1)
+        return check_utils.MockResponseGET()
+
+    engine = make_engine(
+        tenants[:1], RecordingBot(), mock_get, sleep=asyncio.sleep,
+        shard=shard, max_concurrency=1
+    )
+
+    async def run():
+        running = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.2)
+        renewals = len(claims)
+        released.set()
+        engine.stop()
+        await asyncio.wait_for(running, 1)
+        return renewals
+
+    assert asyncio.run(run()) > 3
+
+
+def test_stop_ends_the_run_and_sends_the_held_changes(
+        make_engine, tenants, data_with_new_hw_status
+):
+    def mock_get(*args, **kwargs):
+        return check_utils.MockResponseGET(data=data_with_new_hw_status)
+
+    bot = RecordingBot()
+    engine = make_engine(
+        tenants, bot, mock_get, sleep=asyncio.sleep, digest_window=3600
+    )
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.2, engine.stop)
+        await asyncio.wait_for(engine.run(), 1)
+
+    asyncio.run(run())
+
+    assert sorted(chat_id for chat_id, _ in bot.sent) == sorted(
+        tenant.chat_id for tenant in tenants
+    )
+
+
+def test_stop_leaves_the_undelivered_messages_in_the_outbox(
+        make_engine, engine_module, tenants, data_with_new_hw_status,
+        monkeypatch, caplog
+):
+    class FailingBot(RecordingBot):
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            raise requests.ConnectionError('Telegram is down.')
+
+    def mock_get(*args, **kwargs):
+        return check_utils.MockResponseGET(data=data_with_new_hw_status)
+
+    monkeypatch.setattr(engine_module, 'DELIVERY_DRAIN_TIMEOUT', 0.1)
+    engine = make_engine(
+        tenants[:1], FailingBot(), mock_get, sleep=asyncio.sleep
+    )
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.2, engine.stop)
+        await asyncio.wait_for(engine.run(), 1)
+
+    asyncio.run(run())
+
+    assert 'Stopped with 1 messages undelivered.' in caplog.text
+
+
+def test_reconfigure_restarts_only_the_affected_tenants(
+        make_engine, tenants, random_timestamp
+):
+    from config import Config
+    from scheduler import AdaptivePolicy
+
+    polled = []
+
+    def mock_get(*args, **kwargs):
+        polled.append(kwargs['headers']['Authorization'][6:])
+        return check_utils.MockResponseGET(random_timestamp=random_timestamp)
+
+    engine = make_engine(
+        tenants[:3], RecordingBot(), mock_get, sleep=asyncio.sleep,
+        policy=AdaptivePolicy(0.01, 0.01, 0.01)
+    )
+    config = Config(
+        'token', tuple(tenants[1:]),
+        reviewing_period=0.01, default_period=0.01, idle_period=0.01,
+    )
+
+    async def run():
+        running = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.05)
+        kept = engine._tasks[tenants[1].key]
+        await engine.reconfigure(config)
+        await asyncio.sleep(0.05)
+        polled.clear()
+        await asyncio.sleep(0.1)
+        engine.stop()
+        await asyncio.wait_for(running, 1)
+        return kept
+
+    kept = asyncio.run(run())
+
+    assert engine._tasks[tenants[1].key] is kept
+    assert set(polled) == {tenant.practicum_token for tenant in tenants[1:]}
+
+
+def test_reload_may_replace_every_tenant(
+        make_engine, tenants, random_timestamp
+):
+    from config import Config
+    from scheduler import AdaptivePolicy
+
+    polled = []
+
+    def mock_get(*args, **kwargs):
+        polled.append(kwargs['headers']['Authorization'][6:])
+        return check_utils.MockResponseGET(random_timestamp=random_timestamp)
+
+    class Reloader:
+        def changed(self):
+            return False
+
+        def reload(self):
+            return Config(
+                'token', (tenants[1],),
+                reviewing_period=0.01, default_period=0.01, idle_period=0.01,
+            )
+
+    engine = make_engine(
+        tenants[:1], RecordingBot(), mock_get, sleep=asyncio.sleep,
+        policy=AdaptivePolicy(0.01, 0.01, 0.01), reloader=Reloader()
+    )
+
+    async def run():
+        running = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.05)
+        engine.request_reload()
+        await asyncio.sleep(0.1)
+        assert not running.done()
+        polled.clear()
+        await asyncio.sleep(0.05)
+        engine.stop()
+        await asyncio.wait_for(running, 1)
+
+    asyncio.run(run())
+
+    assert set(polled) == {tenants[1].practicum_token}
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+from telebot import TeleBot, apihelper
+
+from benchmarks.fake_servers import (
+    FakePracticumServer,
+    FakeTelegramServer,
+    FaultProfile,
+)
+from exceptions import SendTelegramException, StatusCodeException
+
+
+@pytest.fixture
+def practicum(monkeypatch, homework_module):
+    now = time.time()
+    server = FakePracticumServer(timelines={'sometoken': [
+        (now - 100, {'id': 1, 'homework_name': 'hw.zip',
+                     'status': 'reviewing'}),
+        (now - 50, {'id': 1, 'homework_name': 'hw.zip',
+                    'status': 'approved'}),
+    ]}).start()
+    monkeypatch.setattr(homework_module, 'ENDPOINT', server.url + '/api/')
+    monkeypatch.setattr(
+        homework_module, 'HEADERS', {'Authorization': 'OAuth sometoken'}
+    )
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    server = FakeTelegramServer().start()
+    monkeypatch.setattr(apihelper, 'API_URL', server.api_url)
+    yield server
+    server.stop()
+
+
+def test_practicum_timeline(practicum, homework_module):
+    response = homework_module.get_api_answer(int(time.time()) - 75)
+    assert [homework['status'] for homework in response['homeworks']] == [
+        'approved'
+    ]
+    assert homework_module.get_api_answer(int(time.time()))['homeworks'] == []
+
+
+def test_practicum_error_rate(practicum, homework_module):
+    practicum.faults = FaultProfile(error_rate=1)
+    with pytest.raises(StatusCodeException):
+        homework_module.get_api_answer(0)
+    assert practicum.stats['error'] == 1
+
+
+def test_telegram_counts_messages(telegram, homework_module):
+    homework_module.send_message(TeleBot(token='1234:abcdefg'), 'text')
+    assert telegram.messages == {'12345': 1}
+
+
+def test_telegram_throttling(telegram, homework_module):
+    telegram.faults = FaultProfile(throttle_rate=1, retry_after=3)
+    with pytest.raises(SendTelegramException) as error:
+        homework_module.send_message(TeleBot(token='1234:abcdefg'), 'text')
+    assert error.value.__cause__.result_json['parameters'] == {
+        'retry_after': 3
+    }
+
+
+def test_telegram_threads_share_a_connection(
+        telegram, homework_module, monkeypatch
+):
+    monkeypatch.setattr(apihelper, 'CUSTOM_REQUEST_SENDER', None)
+    homework_module.configure_telegram()
+    client = apihelper.CUSTOM_REQUEST_SENDER.__self__
+    bot = TeleBot(token='1234:abcdefg')
+    for _ in range(3):
+        thread = threading.Thread(
+            target=homework_module.send_message, args=(bot, 'text')
+        )
+        thread.start()
+        thread.join()
+    stats = client.stats()
+    client.close()
+    assert telegram.messages == {'12345': 3}
+    assert stats.connections == 1
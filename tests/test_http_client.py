@@ -0,0 +1,86 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import PooledClient
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"homeworks": [], "current_date": 1}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_connection_is_reused(server_url):
+    client = PooledClient()
+    for _ in range(3):
+        assert client.get(server_url).json()['current_date'] == 1
+    stats = client.stats()
+    client.close()
+    assert stats.requests == 3
+    assert stats.connections == 1
+    assert stats.reused == 2
+
+
+def test_idle_connections_are_evicted(server_url):
+    now = [0]
+    client = PooledClient(idle_timeout=10, clock=lambda: now[0])
+    client.get(server_url)
+    now[0] = 5
+    client.get(server_url)
+    now[0] = 20
+    client.get(server_url)
+    stats = client.stats()
+    client.close()
+    assert stats.requests == 3
+    assert stats.connections == 2
+
+
+def test_requests_of_any_method_share_the_pool(server_url):
+    client = PooledClient()
+    client.get(server_url)
+    response = client.request('GET', server_url, timeout=5)
+    stats = client.stats()
+    client.close()
+    assert response.json()['current_date'] == 1
+    assert stats.requests == 2
+    assert stats.connections == 1
+
+
+def test_expired_deadline_does_not_open_the_circuit(server_url):
+    import contextvars
+
+    import requests
+
+    from breaker import CLOSED, get_breaker
+    from deadline import Deadline, current_deadline
+
+    client = PooledClient()
+    context = contextvars.copy_context()
+    context.run(current_deadline.set, Deadline(-1))
+    for _ in range(5):
+        with pytest.raises(requests.Timeout):
+            context.run(client.get, server_url, timeout=(5, 5))
+    client.close()
+
+    assert get_breaker(server_url).state == CLOSED
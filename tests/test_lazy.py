@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def fresh_module(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    return 'colorsys'
+
+
+def test_module_is_executed_on_the_first_use(fresh_module):
+    from lazy import lazy_import
+
+    module = lazy_import(fresh_module)
+
+    assert 'rgb_to_hsv' not in object.__getattribute__(module, '__dict__')
+    assert module.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert sys.modules[fresh_module] is module
+
+
+def test_imported_module_is_shared(fresh_module):
+    from lazy import lazy_import
+
+    module = lazy_import(fresh_module)
+
+    import colorsys
+    assert colorsys is module
+    assert lazy_import(fresh_module) is module
+
+
+def test_missing_module_raises():
+    from lazy import lazy_import
+
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import('no_such_module_here')
+
+
+def test_importing_the_bot_does_not_load_its_clients():
+    loaded = subprocess.run(
+        [sys.executable, '-c',
+         'import sys, homework; print(sorted(name for name in '
+         '("requests", "telebot", "dotenv", "http.server") '
+         'if name in sys.modules and "_Lazy" not in '
+         'type(sys.modules[name]).__name__))'],
+        env=dict(os.environ, ENV_FILE=os.devnull),
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+
+    assert loaded == '[]'
@@ -0,0 +1,141 @@
+import contextvars
+import gzip
+import json
+import logging
+import queue
+
+from log_config import (
+    CompressingRotatingFileHandler,
+    DeduplicatingFilter,
+    DroppingQueueHandler,
+    JsonFormatter,
+    TenantFilter,
+)
+from metrics import LOG_RECORDS_DROPPED
+from tenants import Tenant, current_tenant
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def make_record(message='message %s', args=('text',), level=logging.ERROR):
+    return logging.LogRecord(
+        'homework', level, __file__, 1, message, args, None
+    )
+
+
+def test_records_are_rendered_as_json_with_the_tenant():
+    tenant = Tenant('token', '42')
+    record = make_record()
+    context = contextvars.copy_context()
+    context.run(current_tenant.set, tenant)
+    context.run(TenantFilter().filter, record)
+
+    data = json.loads(JsonFormatter().format(record))
+
+    assert data['message'] == 'message text'
+    assert data['level'] == 'ERROR'
+    assert data['tenant'] == tenant.key
+    assert data['chat_id'] == '42'
+
+
+def test_records_without_tenant_have_no_tenant_fields():
+    record = make_record()
+    TenantFilter().filter(record)
+
+    assert 'tenant' not in json.loads(JsonFormatter().format(record))
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    before = LOG_RECORDS_DROPPED.total()
+
+    handler.emit(make_record())
+    handler.emit(make_record())
+
+    assert LOG_RECORDS_DROPPED.total() == before + 1
+
+
+def test_file_is_rotated_by_size_into_compressed_backups(tmp_path):
+    path = tmp_path / 'program.log'
+    handler = CompressingRotatingFileHandler(
+        str(path), max_bytes=100, backup_count=2, interval=0
+    )
+    handler.setFormatter(JsonFormatter())
+    for number in range(20):
+        handler.emit(make_record(args=(number,)))
+    handler.close()
+
+    backups = sorted(tmp_path.glob('program.log.*.gz'))
+    assert [backup.name for backup in backups] == [
+        'program.log.1.gz', 'program.log.2.gz'
+    ]
+    with gzip.open(backups[0], 'rt', encoding='utf-8') as file:
+        assert json.loads(file.readline())['message'].startswith('message')
+
+
+def test_file_is_rotated_by_age(tmp_path):
+    path = tmp_path / 'program.log'
+    clock = Clock()
+    handler = CompressingRotatingFileHandler(
+        str(path), max_bytes=0, interval=60, clock=clock
+    )
+    handler.emit(make_record())
+    clock.now = 61
+    handler.emit(make_record())
+    handler.close()
+
+    assert (tmp_path / 'program.log.1.gz').exists()
+    assert len(path.read_text(encoding='utf-8').splitlines()) == 1
+
+
+def test_repeated_errors_are_summarized_once_per_window():
+    clock = Clock()
+    dedup = DeduplicatingFilter(window=60, clock=clock)
+    passed = []
+    for second in range(125):
+        clock.now = second
+        record = make_record(
+            'Program crash: %s from chat %s', ('Not 200', second)
+        )
+        if dedup.filter(record):
+            passed.append(record.getMessage())
+
+    assert len(passed) == 3
+    assert passed[1].endswith('(repeated 59 times in 60 seconds)')
+
+
+def test_different_errors_and_debug_records_are_not_muted():
+    dedup = DeduplicatingFilter(window=60, clock=Clock())
+
+    assert dedup.filter(make_record('first failure', ()))
+    assert dedup.filter(make_record('second failure', ()))
+    assert dedup.filter(make_record('debug', (), level=logging.DEBUG))
+    assert dedup.filter(make_record('debug', (), level=logging.DEBUG))
+
+
+def test_request_errors_do_not_leak_the_token(monkeypatch):
+    import requests
+
+    import homework
+    from exceptions import StatusCodeException
+
+    def mock_get(*args, **kwargs):
+        raise requests.ConnectionError('connection refused')
+
+    monkeypatch.setattr(requests, 'get', mock_get)
+    monkeypatch.setattr(
+        homework, 'HEADERS', {'Authorization': 'OAuth secrettoken'}
+    )
+    try:
+        homework.get_api_answer(0)
+    except StatusCodeException as error:
+        assert 'secrettoken' not in str(error)
+        assert 'from_date' in str(error)
+    else:
+        raise AssertionError('StatusCodeException is not raised.')
@@ -0,0 +1,70 @@
+import contextvars
+
+import pytest
+
+from exceptions import UndefinedStatusException
+from messages import CATALOG, MessageCatalog
+from tenants import Tenant, current_tenant
+
+
+@pytest.fixture
+def catalog():
+    return MessageCatalog()
+
+
+def test_default_locale_adds_the_fields_to_the_original_message(catalog):
+    message = catalog.render(
+        'hw.zip', 'approved',
+        lesson_name='Итоговый проект', reviewer_comment='Всё нравится'
+    )
+
+    assert message == (
+        'Изменился статус проверки работы "hw.zip". Урок «Итоговый проект».\n'
+        'Комментарий ревьюера: Всё нравится\n'
+        + CATALOG['ru']['verdicts']['approved']
+    )
+    assert catalog.render('hw.zip', 'approved') == (
+        'Изменился статус проверки работы "hw.zip".'
+        + CATALOG['ru']['verdicts']['approved']
+    )
+
+
+def test_optional_fields_are_rendered_when_set(catalog):
+    with_fields = catalog.render(
+        'hw.zip', 'rejected', 'en',
+        lesson_name='Final project', reviewer_comment='Fix the tests'
+    )
+    without_fields = catalog.render('hw.zip', 'rejected', 'en')
+
+    assert '(Final project)' in with_fields
+    assert with_fields.endswith('Reviewer comment: Fix the tests')
+    assert 'Reviewer comment' not in without_fields
+
+
+def test_braces_in_the_fields_are_kept(catalog):
+    message = catalog.render('{hw}.zip', 'reviewing', 'en', lesson_name='{}')
+
+    assert '"{hw}.zip" ({})' in message
+
+
+def test_unknown_locale_falls_back_to_the_default(catalog):
+    assert catalog.render('hw.zip', 'reviewing', 'xx') == catalog.render(
+        'hw.zip', 'reviewing'
+    )
+
+
+def test_unknown_status_raises(catalog):
+    with pytest.raises(UndefinedStatusException):
+        catalog.render('hw.zip', 'unknown', 'en')
+
+
+def test_parse_status_uses_the_tenant_locale():
+    import homework
+    context = contextvars.copy_context()
+    context.run(current_tenant.set, Tenant('token', '1', 'en'))
+
+    message = context.run(homework.parse_status, {
+        'homework_name': 'hw.zip', 'status': 'approved'
+    })
+
+    assert message.startswith('The review status of "hw.zip"')
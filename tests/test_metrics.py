@@ -0,0 +1,65 @@
+import urllib.request
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, Registry, start_server
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+def test_counter_with_labels(registry):
+    errors = registry.register(
+        Counter('errors_total', 'Errors.', ('exception',))
+    )
+    errors.inc(exception='StatusCodeException')
+    errors.inc(2, exception='StatusCodeException')
+    assert errors.value(exception='StatusCodeException') == 3
+    assert (
+        'errors_total{exception="StatusCodeException"} 3'
+        in registry.render()
+    )
+    with pytest.raises(ValueError):
+        errors.inc(tenant='1')
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = registry.register(
+        Histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    )
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'latency_seconds_count 3' in lines
+    assert latency.count() == 3
+
+
+def test_gauge_reads_function(registry):
+    depth = registry.register(Gauge('queue_depth', 'Depth.'))
+    depth.set_function(lambda: 7)
+    assert 'queue_depth 7' in registry.render()
+
+
+def test_duplicate_metric_is_rejected(registry):
+    registry.register(Counter('polls_total', 'Polls.'))
+    with pytest.raises(ValueError):
+        registry.register(Counter('polls_total', 'Polls.'))
+
+
+def test_server_exposes_metrics(registry):
+    registry.register(Counter('polls_total', 'Polls.')).inc()
+    server = start_server(0, registry=registry)
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+        with urllib.request.urlopen(url) as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert '# TYPE polls_total counter' in body
+    assert 'polls_total 1' in body
@@ -0,0 +1,206 @@
+import asyncio
+
+import pytest
+from telebot import apihelper
+
+import tests.check_utils as check_utils
+from delivery import DeliveryQueue
+from outbox import DEAD, DELIVERED, NEW, PENDING, Outbox, idempotency_key
+from schema import VALIDATOR
+from tenants import Tenant
+
+TENANT = Tenant('token', '1')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, secs):
+        self.now += secs
+
+
+class FailingBot(check_utils.MockTelegramBot):
+    def __init__(self, failures=0, error_code=502):
+        super().__init__()
+        self.failures = failures
+        self.error_code = error_code
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise apihelper.ApiTelegramException('sendMessage', None, {
+                'error_code': self.error_code, 'description': 'Failure',
+            })
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def outbox(tmp_path, clock):
+    outbox = Outbox(str(tmp_path / 'state.db'), retention=60, clock=clock)
+    yield outbox
+    outbox.close()
+
+
+def run_queue(queue, action):
+    async def run():
+        queue.start()
+        action(queue)
+        await queue.join()
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_message_is_stored_once_per_idempotency_key(outbox):
+    message_id, state = outbox.add(TENANT.key, 'text', 'hw:approved:')
+
+    assert state == NEW
+    assert outbox.add(TENANT.key, 'text', 'hw:approved:') == (
+        message_id, PENDING
+    )
+    assert outbox.add('other', 'text', 'hw:approved:')[1] == NEW
+    assert outbox.add(TENANT.key, 'crash', None)[1] == NEW
+    assert outbox.add(TENANT.key, 'crash', None)[1] == NEW
+    outbox.mark_delivered(message_id)
+    assert outbox.add(TENANT.key, 'text', 'hw:approved:')[1] == DELIVERED
+
+
+def test_key_tells_apart_the_returns_to_a_status():
+    first, second = (
+        VALIDATOR.validate({'homeworks': [{
+            'id': 1, 'homework_name': 'hw.zip', 'status': 'reviewing',
+            'date_updated': date,
+        }]}).homeworks[0]
+        for date in ('2020-02-13T14:40:57Z', '2020-02-15T10:00:00Z')
+    )
+
+    assert idempotency_key(first) != idempotency_key(second)
+
+
+def test_transient_failures_are_retried_and_recorded(outbox, clock):
+    bot = FailingBot(failures=2)
+    queue = DeliveryQueue(
+        bot, workers=1, sleep=clock.sleep, clock=clock, outbox=outbox
+    )
+    run_queue(queue, lambda queue: queue.put(TENANT, 'text', key='key'))
+
+    assert bot.sent == [('1', 'text')]
+    assert outbox.pending([TENANT.key]) == []
+    assert outbox.add(TENANT.key, 'text', 'key')[1] == DELIVERED
+
+
+def test_rejected_message_is_dead_lettered(outbox, clock):
+    bot = FailingBot(failures=1, error_code=403)
+    queue = DeliveryQueue(
+        bot, workers=1, sleep=clock.sleep, clock=clock, outbox=outbox
+    )
+    run_queue(queue, lambda queue: queue.put(TENANT, 'text', key='key'))
+
+    assert bot.sent == []
+    assert [message.text for message in outbox.dead_letters()] == ['text']
+    assert outbox.add(TENANT.key, 'text', 'key')[1] == DEAD
+
+
+def test_undelivered_messages_are_resumed_after_restart(outbox, clock):
+    outbox.add(TENANT.key, 'first', 'first')
+    outbox.add(TENANT.key, 'second', 'second')
+    bot = FailingBot()
+    queue = DeliveryQueue(
+        bot, workers=1, sleep=clock.sleep, clock=clock, outbox=outbox
+    )
+    run_queue(queue, lambda queue: queue.resume([TENANT]))
+
+    assert [text for _, text in bot.sent] == ['first', 'second']
+    assert outbox.pending([TENANT.key]) == []
+
+
+def test_finished_messages_are_purged(outbox, clock):
+    delivered, _ = outbox.add(TENANT.key, 'delivered', 'delivered')
+    outbox.add(TENANT.key, 'pending', 'pending')
+    outbox.mark_delivered(delivered)
+    clock.now += 61
+    outbox.purge()
+
+    assert outbox.add(TENANT.key, 'delivered', 'delivered')[1] == NEW
+    assert [message.text for message in outbox.pending([TENANT.key])] == [
+        'pending', 'delivered'
+    ]
+
+
+def test_main_sends_the_change_again_after_a_failure(
+        monkeypatch, data_with_new_hw_status
+):
+    import time
+
+    import homework
+
+    from_dates = []
+    bot = FailingBot(failures=1)
+    cycles = iter(range(2))
+
+    def mock_get(*args, **kwargs):
+        from_dates.append(kwargs['params']['from_date'])
+        return check_utils.MockResponseGET(data=data_with_new_hw_status)
+
+    def sleep(secs):
+        if next(cycles) == 1:
+            raise check_utils.BreakInfiniteLoop('break')
+
+    monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'sometoken')
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+    monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '12345')
+    monkeypatch.setattr(homework.telebot, 'TeleBot', lambda token: bot)
+    monkeypatch.setattr(homework.requests, 'get', mock_get)
+    monkeypatch.setattr(time, 'sleep', sleep)
+    with pytest.raises(check_utils.BreakInfiniteLoop):
+        homework.main()
+
+    assert from_dates[0] == from_dates[1]
+    assert len(bot.sent) == 1
+
+
+def test_main_skips_an_invalid_homework_and_moves_on(
+        monkeypatch, data_with_new_hw_status
+):
+    import time
+
+    import homework
+
+    from_dates = []
+    bot = FailingBot(failures=0)
+    cycles = iter(range(2))
+    data = dict(data_with_new_hw_status)
+    data['homeworks'] = data['homeworks'] + [
+        {'id': 1, 'homework_name': 'old.zip', 'status': 'on_hold'}
+    ]
+
+    def mock_get(*args, **kwargs):
+        from_dates.append(kwargs['params']['from_date'])
+        return check_utils.MockResponseGET(data=data)
+
+    def sleep(secs):
+        if next(cycles) == 1:
+            raise check_utils.BreakInfiniteLoop('break')
+
+    monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'sometoken')
+    monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+    monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '12345')
+    monkeypatch.setattr(homework.telebot, 'TeleBot', lambda token: bot)
+    monkeypatch.setattr(homework.requests, 'get', mock_get)
+    monkeypatch.setattr(time, 'sleep', sleep)
+    with pytest.raises(check_utils.BreakInfiniteLoop):
+        homework.main()
+
+    assert from_dates[1] == data['current_date']
+    assert len(bot.sent) == 1
+    assert 'hw123.zip' in bot.sent[0][1]
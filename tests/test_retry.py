@@ -0,0 +1,116 @@
+import random
+import threading
+
+import pytest
+import requests
+
+from retry import RetryPolicy, parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {}
+        if retry_after is not None:
+            self.headers['Retry-After'] = retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, secs):
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+def make_send(*outcomes):
+    outcomes = list(outcomes)
+    calls = []
+
+    def send():
+        calls.append(None)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    send.calls = calls
+    return send
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def policy(clock):
+    return RetryPolicy(
+        max_attempts=4, base_delay=1, max_delay=8, budget=60,
+        rng=random.Random(1), sleep=clock.sleep, clock=clock
+    )
+
+
+def test_transient_errors_are_retried(policy, clock):
+    send = make_send(
+        requests.ConnectionError('reset'),
+        FakeResponse(502),
+        FakeResponse(200),
+    )
+    assert policy.call(send).status_code == 200
+    assert len(send.calls) == 3
+    assert 0 <= clock.sleeps[0] <= 1
+    assert 0 <= clock.sleeps[1] <= 2
+
+
+@pytest.mark.parametrize('status_code', [400, 401, 404])
+def test_permanent_errors_are_not_retried(policy, clock, status_code):
+    send = make_send(FakeResponse(status_code))
+    assert policy.call(send).status_code == status_code
+    assert clock.sleeps == []
+
+
+def test_retry_after_is_respected(policy, clock):
+    send = make_send(FakeResponse(429, retry_after='7'), FakeResponse(200))
+    assert policy.call(send).status_code == 200
+    assert clock.sleeps == [7]
+
+
+def test_retry_after_beyond_budget_gives_up(policy, clock):
+    send = make_send(FakeResponse(503, retry_after='120'))
+    assert policy.call(send).status_code == 503
+    assert clock.sleeps == []
+
+
+def test_retries_stop_when_the_shutdown_starts(policy, clock, monkeypatch):
+    import deadline
+
+    monkeypatch.setattr(deadline, 'shutdown_deadline', None)
+    monkeypatch.setattr(deadline, 'shutdown_started', threading.Event())
+
+    def send():
+        deadline.start_shutdown(1)
+        return FakeResponse(503, retry_after='5')
+
+    assert policy.call(send).status_code == 503
+    assert clock.sleeps == []
+
+
+def test_attempts_are_limited(policy):
+    error = requests.Timeout('timed out')
+    send = make_send(*[error] * 4)
+    with pytest.raises(requests.Timeout):
+        policy.call(send)
+    assert len(send.calls) == 4
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after(
+        'Wed, 21 Oct 2015 07:28:30 GMT', now=1445412500
+    ) == 10
+    assert parse_retry_after('soon') is None
@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+from scheduler import AdaptivePolicy, FixedPolicy
+
+
+def test_fixed_policy_ignores_status():
+    policy = FixedPolicy(600)
+    assert policy.next_delay('reviewing') == policy.next_delay(None) == 600
+
+
+@pytest.mark.parametrize('status, period', [
+    ('reviewing', 60),
+    ('rejected', 600),
+    ('approved', 3600),
+    (None, 3600),
+])
+def test_adaptive_policy_without_jitter(status, period):
+    policy = AdaptivePolicy(
+        reviewing_period=60, default_period=600, idle_period=3600, jitter=0
+    )
+    assert policy.next_delay(status) == period
+
+
+def test_adaptive_policy_jitter_stays_in_bounds():
+    policy = AdaptivePolicy(
+        reviewing_period=100, jitter=0.2, rng=random.Random(1)
+    )
+    delays = {policy.next_delay('reviewing') for _ in range(100)}
+    assert len(delays) > 1
+    assert all(80 <= delay <= 120 for delay in delays)
@@ -0,0 +1,80 @@
+import dataclasses
+from datetime import datetime, timezone
+
+import pytest
+
+from exceptions import SchemaException
+from schema import VALIDATOR, Homework, HomeworkStatus
+from state import HomeworkIndex
+
+
+def test_valid_response_is_turned_into_records():
+    result = VALIDATOR.validate({
+        'homeworks': [{
+            'id': 123,
+            'homework_name': 'hw.zip',
+            'status': 'approved',
+            'date_updated': '2020-02-13T14:40:57Z',
+            'lesson_name': 'Итоговый проект',
+            'reviewer_comment': 'Всё нравится',
+            'unused': 'field',
+        }],
+        'current_date': 1000,
+    })
+
+    assert result.errors == ()
+    assert result.current_date == 1000
+    assert result.homeworks == (Homework(
+        123, 'hw.zip', HomeworkStatus.APPROVED,
+        datetime(2020, 2, 13, 14, 40, 57, tzinfo=timezone.utc),
+        'Итоговый проект', 'Всё нравится',
+    ),)
+
+
+def test_every_error_is_collected():
+    result = VALIDATOR.validate({'homeworks': [
+        {'id': 'x', 'status': 'unknown', 'date_updated': 'yesterday'},
+        {'homework_name': 'good.zip', 'status': 'reviewing'},
+        'not a homework',
+    ]})
+
+    assert [homework.name for homework in result.homeworks] == ['good.zip']
+    assert len(result.errors) == 5
+    assert result.errors[0].startswith('homeworks[0].id')
+    assert result.errors[-1] == 'homeworks[2]: must be an object'
+
+
+@pytest.mark.parametrize('response', [
+    [], {}, {'homeworks': {}}, {'homeworks': [], 'current_date': 'now'},
+])
+def test_invalid_response_raises(response):
+    with pytest.raises(SchemaException):
+        VALIDATOR.validate(response)
+
+
+def test_records_are_compact_and_immutable():
+    record = Homework(1, 'hw.zip', HomeworkStatus.REVIEWING)
+
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        record.status = HomeworkStatus.APPROVED
+
+
+def test_index_tracks_records_and_dicts_alike():
+    index = HomeworkIndex()
+    index.update({'id': 1, 'homework_name': 'hw.zip', 'status': 'reviewing'})
+
+    assert list(index.changes([
+        Homework(1, 'hw.zip', HomeworkStatus.REVIEWING)
+    ])) == []
+    assert len(list(index.changes([
+        Homework(1, 'hw.zip', HomeworkStatus.APPROVED)
+    ]))) == 1
+
+
+def test_parse_status_renders_a_record():
+    import homework
+
+    assert homework.parse_status(
+        Homework(1, 'hw.zip', HomeworkStatus.REJECTED)
+    ) == homework.parse_status({'homework_name': 'hw.zip', 'status': 'rejected'})
@@ -0,0 +1,105 @@
+from collections import Counter
+
+import pytest
+
+from sharding import HashRing, ShardCoordinator
+
+KEYS = [f'{number}:tenant' for number in range(1000)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def make_coordinator(tmp_path, clock):
+    coordinators = []
+
+    def make(worker_id):
+        coordinator = ShardCoordinator(
+            str(tmp_path / 'shards.db'), worker_id, lease_ttl=30, clock=clock
+        )
+        coordinators.append(coordinator)
+        return coordinator
+
+    return make
+
+
+def test_ring_spreads_the_keys_evenly():
+    ring = HashRing(['a', 'b', 'c', 'd'])
+    counts = Counter(ring.owner(key) for key in KEYS)
+
+    assert set(counts) == {'a', 'b', 'c', 'd'}
+    assert min(counts.values()) > len(KEYS) / 4 * 0.7
+
+
+def test_joining_worker_only_moves_its_share():
+    before = HashRing(['a', 'b', 'c'])
+    after = HashRing(['a', 'b', 'c', 'd'])
+    moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+
+    assert all(after.owner(key) == 'd' for key in moved)
+    assert len(moved) < len(KEYS) / 4 * 1.3
+
+
+def test_workers_own_disjoint_shards(make_coordinator):
+    first = make_coordinator('first')
+    second = make_coordinator('second')
+    first.heartbeat()
+    second.heartbeat()
+    for coordinator in (first, second):
+        coordinator.release(coordinator.owned - coordinator.assigned(KEYS))
+        coordinator.claim(coordinator.assigned(KEYS))
+
+    assert not first.owned & second.owned
+    assert first.owned | second.owned == set(KEYS)
+
+
+def test_lease_is_not_stolen_before_it_expires(make_coordinator, clock):
+    first = make_coordinator('first')
+    second = make_coordinator('second')
+    first.claim(KEYS[:10])
+
+    assert second.claim(KEYS[:10]) == frozenset()
+    clock.now += 31
+    assert second.claim(KEYS[:10]) == frozenset(KEYS[:10])
+
+
+def test_tenants_of_a_dead_worker_are_taken_over(make_coordinator, clock):
+    first = make_coordinator('first')
+    second = make_coordinator('second')
+    first.heartbeat()
+    first.claim(first.assigned(KEYS))
+    second.claim(second.assigned(KEYS))
+    clock.now += 31
+    gained = []
+    second.claim(second.assigned(KEYS), gained.append)
+
+    assert second.owned == set(KEYS)
+    assert set(gained) == first.owned
+
+
+
+def test_expired_lease_is_not_owned_until_renewed(make_coordinator, clock):
+    first = make_coordinator('first')
+    second = make_coordinator('second')
+    first.claim(KEYS[:10])
+    clock.now += 31
+
+    assert not first.owns(KEYS[0])
+    second.claim(KEYS[:10])
+    clock.now += 31
+    gained = []
+    first.claim(KEYS[:10], gained.append)
+
+    assert first.owns(KEYS[0])
+    assert set(gained) == set(KEYS[:10])
@@ -0,0 +1,111 @@
+import logging
+import signal
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def shutdown(monkeypatch):
+    import deadline
+    from shutdown import GracefulShutdown
+
+    monkeypatch.setattr(deadline, 'shutdown_deadline', None)
+    monkeypatch.setattr(deadline, 'shutdown_started', threading.Event())
+    graceful = GracefulShutdown(timeout=5)
+    monkeypatch.setattr(graceful, '_kill', lambda: None)
+    return graceful
+
+
+def test_request_outside_a_wait_only_sets_the_flag(shutdown):
+    import deadline
+
+    shutdown.request(signal.SIGTERM)
+
+    assert shutdown.is_set()
+    assert 0 < deadline.time_left() <= 5
+
+
+def test_watchdog_reports_and_limits_the_shutdown(shutdown, caplog):
+    killed = threading.Event()
+    shutdown.timeout = 0.01
+    shutdown._kill = killed.set
+    shutdown.watch()
+
+    with caplog.at_level(logging.INFO):
+        shutdown.request(signal.SIGTERM)
+        assert killed.wait(1)
+
+    assert 'Shutting down on the signal 15.' in caplog.text
+
+
+def test_request_during_a_wait_ends_it(shutdown):
+    with pytest.raises(SystemExit) as error:
+        with shutdown.interruptible():
+            shutdown.request(signal.SIGTERM)
+            pytest.fail('The wait is not interrupted.')
+
+    assert error.value.code == 0
+
+
+def test_no_wait_starts_after_the_request(shutdown):
+    shutdown.request(signal.SIGTERM)
+
+    with pytest.raises(SystemExit):
+        with shutdown.interruptible():
+            pytest.fail('The wait is started.')
+
+
+def test_network_calls_are_clipped_by_the_shutdown(shutdown):
+    import requests
+
+    from deadline import clip, start_shutdown
+
+    start_shutdown(0.01)
+    time.sleep(0.02)
+
+    with pytest.raises(requests.Timeout):
+        clip(10)
+
+
+def test_shutdown_ends_the_sleeps_between_the_retries(shutdown):
+    from deadline import sleep, start_shutdown
+
+    threading.Timer(0.05, start_shutdown, (5,)).start()
+    started = time.monotonic()
+    sleep(5)
+
+    assert time.monotonic() - started < 1
+
+
+def test_main_stops_after_the_cycle(
+        shutdown, monkeypatch, data_with_new_hw_status
+):
+    import homework
+    import tests.check_utils as check_utils
+
+    sent = []
+
+    class Bot(check_utils.MockTelegramBot):
+        def send_message(self, chat_id=None, text=None, **kwargs):
+            sent.append(text)
+            shutdown.request(signal.SIGTERM)
+
+    def sleep(secs):
+        pytest.fail('The worker sleeps after the shutdown.')
+
+    monkeypatch.setattr(homework, 'SHUTDOWN', shutdown)
+    monkeypatch.setattr(homework.telebot, 'TeleBot', Bot)
+    monkeypatch.setattr(
+        homework.requests, 'get',
+        lambda *args, **kwargs: check_utils.MockResponseGET(
+            data=data_with_new_hw_status
+        )
+    )
+    monkeypatch.setattr(homework.time, 'sleep', sleep)
+
+    with pytest.raises(SystemExit):
+        homework.main()
+
+    assert len(sent) == 1
@@ -0,0 +1,53 @@
+import sqlite3
+
+from state import HomeworkIndex, StateStore
+
+
+def test_state_survives_reopening(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = StateStore(path)
+    store.save_cursor('tenant', 1000198000)
+    store.save_status('tenant', 777, 'reviewing')
+    store.save_status('tenant', 777, 'approved')
+    store.close()
+
+    records = StateStore(path).load()
+    assert records['tenant'].current_date == 1000198000
+    assert records['tenant'].statuses == {'777': 'approved'}
+
+
+def test_writes_are_batched(tmp_path):
+    path = str(tmp_path / 'state.db')
+    store = StateStore(path, batch_size=3, clock=lambda: 0)
+
+    def stored_cursors():
+        with sqlite3.connect(path) as connection:
+            return connection.execute(
+                'SELECT COUNT(*) FROM cursors'
+            ).fetchone()[0]
+
+    store.save_cursor('first', 1)
+    store.save_cursor('second', 2)
+    assert stored_cursors() == 0
+    store.save_cursor('third', 3)
+    assert stored_cursors() == 3
+
+
+def test_database_uses_wal(tmp_path):
+    path = str(tmp_path / 'state.db')
+    StateStore(path).close()
+    with sqlite3.connect(path) as connection:
+        mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+    assert mode == 'wal'
+
+
+def test_index_yields_only_status_transitions():
+    index = HomeworkIndex({'1': 'reviewing'})
+    homeworks = [
+        {'id': 1, 'homework_name': 'first', 'status': 'reviewing'},
+        {'id': 2, 'homework_name': 'second', 'status': 'rejected'},
+    ]
+    assert list(index.changes(homeworks)) == homeworks[1:]
+    index.update(homeworks[1])
+    homeworks[0]['status'] = 'approved'
+    assert list(index.changes(homeworks)) == homeworks[:1]